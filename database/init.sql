@@ -20,7 +20,16 @@ CREATE TABLE IF NOT EXISTS tasks (
     updated_at TIMESTAMPTZ DEFAULT NOW(),
     retry_count INTEGER DEFAULT 0,
     priority INTEGER DEFAULT 5,
-    config JSONB DEFAULT '{}'::jsonb
+    config JSONB DEFAULT '{}'::jsonb,
+    batch_id UUID
+);
+
+CREATE TABLE IF NOT EXISTS task_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    task_id UUID NOT NULL,
+    priority INTEGER DEFAULT 5,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    sent_at TIMESTAMPTZ
 );
 
 CREATE TABLE IF NOT EXISTS tools_registry (
@@ -75,9 +84,14 @@ CREATE TABLE IF NOT EXISTS task_logs (
 CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
 CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+CREATE INDEX IF NOT EXISTS ix_tasks_batch_id ON tasks(batch_id);
+CREATE INDEX IF NOT EXISTS idx_task_outbox_unsent ON task_outbox(id) WHERE sent_at IS NULL;
 CREATE INDEX IF NOT EXISTS idx_task_logs_task_id ON task_logs(task_id);
 CREATE INDEX IF NOT EXISTS idx_task_logs_trace_id ON task_logs(trace_id);
 CREATE INDEX IF NOT EXISTS idx_knowledge_base_docs_user_id ON knowledge_base_docs(user_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_status_created ON tasks(user_id, status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_knowledge_base_docs_user_created ON knowledge_base_docs(user_id, created_at, id);
 
 INSERT INTO users (id, username, email, password_hash) VALUES 
 ('00000000-0000-0000-0000-000000000001', 'admin', 'admin@mandas.local', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj6hsxq5S/kS') -- password: admin123
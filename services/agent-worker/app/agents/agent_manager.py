@@ -11,24 +11,32 @@ from app.memory.memory_manager import MemoryManager
 
 
 class AgentManager:
-    def __init__(self):
+    def __init__(self, memory_manager: MemoryManager = None):
         self.llm_router = None
         self.tool_executor = None
-        self.memory_manager = None
+        # 传入的 MemoryManager 由调用方初始化和关闭
+        self.memory_manager = memory_manager
+        self._owns_memory_manager = memory_manager is None
         self.agents = {}
 
     async def initialize(self):
         self.llm_router = LLMRouter()
         self.tool_executor = ToolExecutor()
-        self.memory_manager = MemoryManager()
+        if self._owns_memory_manager:
+            self.memory_manager = MemoryManager()
         
         await self.llm_router.initialize()
         await self.tool_executor.initialize()
-        await self.memory_manager.initialize()
+        if self._owns_memory_manager:
+            await self.memory_manager.initialize()
         
         await self.setup_agents()
         logger.info("Agent Manager initialized successfully")
 
+    async def close(self):
+        if self._owns_memory_manager and self.memory_manager:
+            await self.memory_manager.close()
+
     async def setup_agents(self):
         llm_config = await self.llm_router.get_default_config()
         
@@ -1,4 +1,5 @@
 import asyncio
+import threading
 from typing import Dict, Any, List, Optional
 from loguru import logger
 try:
@@ -14,6 +15,48 @@ from app.core.security.execution_guard import ExecutionGuard
 from app.memory.memory_manager import MemoryManager
 from app.core.planning.planner import TaskPlanner
 from app.llm.llm_router import LLMRouter
+from app.core.deadline import remaining, remaining_timeout
+
+
+class GroupChatStopped(Exception):
+    """群聊因任务取消或超时而提前结束"""
+
+
+class DeadlineGroupChat(RoundRobinGroupChat):
+    """每轮选择发言者前检查停止标志和任务截止时间的群聊
+
+    群聊在线程中同步运行，asyncio 的取消无法到达；没有这项检查，
+    任务超时后线程仍会继续调用 LLM 和工具直到 max_round。
+    """
+
+    def __init__(self, *args, stop_event: Optional[threading.Event] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stop_event = stop_event or threading.Event()
+
+    def select_speaker(self, *args, **kwargs):
+        # 截止时间经 contextvars 随 asyncio.to_thread 传入线程
+        if self.stop_event.is_set() or remaining() == 0:
+            raise GroupChatStopped("Group chat stopped: task cancelled or deadline reached")
+        return super().select_speaker(*args, **kwargs)
+
+
+class DeadlineLLMClient:
+    """在每次调用时把 LLM 请求超时裁剪到当前任务的剩余时间
+
+    Agent 在任务间共享，超时不能写进 llm_config；剩余时间从调用线程的
+    截止时间上下文读取，各任务互不影响。
+    """
+
+    def __init__(self, client, default_timeout: float):
+        self._client = client
+        self._default_timeout = default_timeout
+
+    def create(self, **config):
+        config["timeout"] = remaining_timeout(self._default_timeout)
+        return self._client.create(**config)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
 
 
 class PlannerAgent(AssistantAgent):
@@ -180,17 +223,10 @@ class MandasGroupChatManager:
             )
             self.agents["reviewer"] = ReviewerAgent(llm_config)
             
-            agents_list = [
-                self.agents["user_proxy"],
-                self.agents["planner"], 
-                self.agents["reviewer"]
-            ]
+            for agent in self.agents.values():
+                self._trim_llm_timeout(agent)
             
-            self.group_chat = RoundRobinGroupChat(
-                agents=agents_list,
-                messages=[],
-                max_round=settings.max_agent_rounds
-            )
+            self.group_chat = self._create_group_chat()
             
             logger.info("Group Chat Manager initialized successfully")
             
@@ -215,23 +251,29 @@ class MandasGroupChatManager:
             
             enhanced_prompt = self._build_enhanced_prompt(task_id, prompt, context, config)
             
-            if hasattr(self.group_chat, 'messages'):
-                self.group_chat.messages = []
+            # 每个任务使用独立的群聊，避免并发任务共享消息列表
+            stop_event = threading.Event()
+            group_chat = self._create_group_chat(stop_event)
             
             from autogen import GroupChatManager
             
             group_chat_manager = GroupChatManager(
-                groupchat=self.group_chat,
+                groupchat=group_chat,
                 llm_config=self.llm_config
             )
+            self._trim_llm_timeout(group_chat_manager)
             
-            result = await asyncio.to_thread(
-                group_chat_manager.initiate_chat,
-                self.agents["planner"],
-                message=enhanced_prompt
-            )
+            try:
+                result = await asyncio.to_thread(
+                    group_chat_manager.initiate_chat,
+                    self.agents["planner"],
+                    message=enhanced_prompt
+                )
+            finally:
+                # 任务被取消或超时后，线程中的群聊在下一轮开始前结束
+                stop_event.set()
             
-            conversation_history = self._extract_conversation_history()
+            conversation_history = self._extract_conversation_history(group_chat)
             
             await self.memory_manager.store_conversation(task_id, conversation_history)
             
@@ -259,6 +301,27 @@ class MandasGroupChatManager:
                 "task_id": task_id
             }
     
+    def _create_group_chat(self, stop_event: Optional[threading.Event] = None):
+        """创建新的群聊实例"""
+        agents_list = [
+            self.agents["user_proxy"],
+            self.agents["planner"], 
+            self.agents["reviewer"]
+        ]
+        
+        return DeadlineGroupChat(
+            agents=agents_list,
+            messages=[],
+            max_round=settings.max_agent_rounds,
+            stop_event=stop_event
+        )
+    
+    def _trim_llm_timeout(self, agent):
+        """让 agent 的每次 LLM 调用都按任务剩余时间裁剪超时"""
+        client = getattr(agent, "client", None)
+        if client is not None and not isinstance(client, DeadlineLLMClient):
+            agent.client = DeadlineLLMClient(client, self.llm_config.get("timeout", 300))
+    
     def _build_enhanced_prompt(self, task_id: str, prompt: str, context: str, config: Dict[str, Any]) -> str:
         """构建增强的任务提示"""
         available_tools = self.tool_registry.list_tools(enabled_only=True)
@@ -285,11 +348,11 @@ class MandasGroupChatManager:
 """
         return enhanced_prompt
     
-    def _extract_conversation_history(self) -> List[Dict[str, Any]]:
+    def _extract_conversation_history(self, group_chat) -> List[Dict[str, Any]]:
         """提取对话历史"""
         conversation = []
-        if self.group_chat and hasattr(self.group_chat, 'messages') and self.group_chat.messages:
-            for msg in self.group_chat.messages:
+        if group_chat and hasattr(group_chat, 'messages') and group_chat.messages:
+            for msg in group_chat.messages:
                 conversation.append({
                     "role": msg.get("role", "unknown"),
                     "name": msg.get("name", "unknown"),
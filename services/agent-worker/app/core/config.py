@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 
@@ -16,16 +17,63 @@ class Settings(BaseSettings):
     jwt_expire_minutes: int = 1440
     
     log_level: str = "INFO"
+    # 指标导出：none（默认，不导出）| otlp | prometheus | console（仅用于调试，输出到 stdout）
+    metrics_exporter: str = "none"
+    metrics_export_interval: int = 60  # 秒，otlp/console 的导出周期
+    metrics_otlp_endpoint: str = "http://otel-collector:4317"
+    metrics_prometheus_port: int = 9464
     
     redis_task_stream: str = "mandas:tasks:stream"
     redis_consumer_group: str = "agent-workers"
     redis_consumer_name: str = "worker-1"
     
+    task_events_channel_prefix: str = "mandas:task-events"  # 任务事件按任务发布到 {prefix}:{task_id}
+    task_events_stream_maxlen: int = 1000  # 每个任务保留用于重放的事件数
+    task_events_stream_ttl: int = 86400
+    
+    task_status_key_prefix: str = "mandas:task-status"  # 任务状态文档，供网关响应轮询
+    task_status_ttl: int = 300  # 秒，写入失败时缓存最多落后数据库这么久
+    
+    task_memo_key_prefix: str = "mandas:task-memo"  # 需与 api-gateway 配置保持一致
+    task_memo_window: int = 3600  # 秒，成功结果可被相同提交复用的时间窗口，0 表示关闭
+    
+    # 超过阈值的任务结果压缩后写入结果存储，表中只保留摘要与清单
+    result_store_path: str = "/app/data/results"
+    result_inline_max_bytes: int = 64 * 1024
+    result_summary_field_max_bytes: int = 4 * 1024
+    result_compression_level: int = 3
+    result_store_retention_days: int = 30  # 超过该天数的结果文件会被删除，0 表示永久保留
+    result_store_purge_interval: int = 3600  # 秒
+    
+    worker_concurrency: int = 4  # 每个进程同时执行的任务数
+    
+    # 优先级通道：priority <= high_max 进入 high，>= low_min 进入 low，其余为 normal
+    priority_high_max: int = 3
+    priority_low_min: int = 7
+    priority_lane_weights: Dict[str, int] = {"high": 6, "normal": 3, "low": 1}
+    priority_starvation_timeout: int = 30  # 秒，通道超过该时间未被读取则优先读取
+    
+    pending_idle_timeout: int = 300  # 秒，超过该空闲时间的待处理消息视为消费者已失效
+    pending_reclaim_interval: int = 30
+    task_heartbeat_interval: int = 60  # 必须远小于 pending_idle_timeout
+    shutdown_grace_period: int = 30  # 秒，停机时等待执行中任务完成的时间
+    
+    redis_dead_letter_stream: str = "mandas:tasks:dead-letter"
+    dead_letter_maxlen: int = 10000
+    max_delivery_count: int = 5  # 超过该投递次数的消息进入死信流
+    
     docker_image_python: str = "python:3.11-slim"
     docker_image_ubuntu: str = "ubuntu:22.04"
     
     max_task_timeout: int = 3600  # 1 hour
+    min_task_timeout: int = 10  # 秒，任务配置的超时过小时提升到该值
     max_retry_count: int = 3
+    
+    redis_retry_zset: str = "mandas:tasks:retry"
+    retry_backoff_base: float = 5.0  # 秒，第 n 次重试的上限为 base * 2^(n-1)
+    retry_backoff_max: float = 300.0
+    retry_poll_interval: float = 1.0
+    retry_batch_size: int = 100
     max_agent_rounds: int = 20  # V0.6: GroupChat最大轮数
     
     tools_directory: str = "/app/tools.d"
@@ -35,6 +83,30 @@ class Settings(BaseSettings):
     container_timeout: int = 600
     
     short_term_memory_ttl: int = 3600  # 1小时
+    
+    # 嵌入微批处理：凑满批次或等待超时后在专用线程池中编码
+    embedding_batch_max_size: int = 32
+    embedding_batch_wait_ms: float = 5.0
+    embedding_workers: int = 1
+    
+    # 嵌入缓存：以 sha256(模型, 文本) 为键，进程内 LRU + Redis(float16)，可选 mmap 快照跨重启保留
+    embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_cache_size: int = 10000  # 进程内 LRU 条目数
+    embedding_cache_key_prefix: str = "mandas:embedding"
+    embedding_cache_ttl: int = 7 * 24 * 3600  # 秒
+    embedding_cache_snapshot_path: str = ""  # 为空表示不落盘，例如 /app/data/embeddings.npy
+    embedding_cache_snapshot_max_entries: int = 100000
+    
+    # 上下文构建的 single-flight：同一 key 的并发请求只计算一次，结果经 Redis 发布给其他 worker
+    single_flight_key_prefix: str = "mandas:singleflight"
+    single_flight_lock_ttl: int = 30  # 秒，领导者计算的最长持锁时间
+    single_flight_wait_timeout: float = 10.0  # 秒，等待其他 worker 结果的上限，超时后自行计算
+    
+    # LLM 上下文缓存：键为 sha256(查询) + 任务版本号，remember/store_conversation 写入后更换版本号
+    context_cache_key_prefix: str = "mandas:context"
+    context_cache_size: int = 1024  # 进程内 LRU 条目数
+    context_cache_ttl: int = 60  # 秒
+    context_version_ttl: int = 86400  # 秒，需大于 context_cache_ttl
     max_short_term_messages: int = 50
     
     class Config:
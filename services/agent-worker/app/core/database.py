@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, String, DateTime, Text, Integer, Boolean, ARRAY
+from sqlalchemy.orm import DeclarativeBase, deferred
+from sqlalchemy import text, Column, String, DateTime, Text, Integer, Boolean, ARRAY
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 import uuid
@@ -20,14 +20,16 @@ class Task(Base):
     user_id = Column(UUID(as_uuid=True), nullable=False)
     status = Column(String(50), nullable=False, default="QUEUED")
     prompt = Column(Text, nullable=False)
-    plan = Column(JSONB)
-    result = Column(JSONB)
-    logs = Column(ARRAY(Text))
+    # 大字段延迟加载且访问未加载的列会报错：需要时用 undefer/undefer_group 或直接选择列
+    plan = deferred(Column(JSONB), group="plan", raiseload=True)
+    result = deferred(Column(JSONB), group="output", raiseload=True)
+    logs = deferred(Column(ARRAY(Text)), group="output", raiseload=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     retry_count = Column(Integer, default=0)
     priority = Column(Integer, default=5)
-    config = Column(JSONB, default={})
+    config = deferred(Column(JSONB, default={}), group="config", raiseload=True)
+    batch_id = Column(UUID(as_uuid=True), index=True)  # POST /tasks/batch 提交的任务所属批次
 
 
 class ToolsRegistry(Base):
@@ -60,9 +62,19 @@ engine = create_async_engine(settings.database_url, echo=False)
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# init.sql 只在空数据卷上执行，create_all 也不会修改已存在的表；
+# 旧部署升级所需的列与索引在启动时补齐（语句均可重复执行）
+SCHEMA_UPGRADES = [
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS batch_id UUID",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_batch_id ON tasks(batch_id)",
+]
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("task_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Set a deadline for the current task and everything it awaits.
+
+    Nested scopes can only shorten the deadline. The value is a context
+    variable, so it also reaches code run via ``asyncio.to_thread``.
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without a deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def remaining_timeout(default: float, floor: float = 0.1) -> float:
+    """Trim an operation's own timeout to the remaining task budget."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(min(default, left), floor)
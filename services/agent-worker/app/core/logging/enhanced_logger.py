@@ -1,6 +1,7 @@
 import uuid
 import time
 import json
+from contextvars import ContextVar
 from typing import Dict, Any, Optional
 from loguru import logger
 from contextlib import contextmanager
@@ -16,12 +17,36 @@ def setup_logging():
 
 
 class EnhancedLogger:
-    """Enhanced logger with trace_id support and structured logging"""
+    """Enhanced logger with trace_id support and structured logging
+    
+    Trace context is stored in context variables, so concurrent tasks sharing
+    one logger instance each see their own trace_id/task_id.
+    """
     
     def __init__(self, component_name: str):
         self.component_name = component_name
-        self.current_trace_id: Optional[str] = None
-        self.current_task_id: Optional[str] = None
+        self._trace_id_var: ContextVar[Optional[str]] = ContextVar(
+            f"{component_name}_trace_id", default=None
+        )
+        self._task_id_var: ContextVar[Optional[str]] = ContextVar(
+            f"{component_name}_task_id", default=None
+        )
+    
+    @property
+    def current_trace_id(self) -> Optional[str]:
+        return self._trace_id_var.get()
+    
+    @current_trace_id.setter
+    def current_trace_id(self, value: Optional[str]):
+        self._trace_id_var.set(value)
+    
+    @property
+    def current_task_id(self) -> Optional[str]:
+        return self._task_id_var.get()
+    
+    @current_task_id.setter
+    def current_task_id(self, value: Optional[str]):
+        self._task_id_var.set(value)
     
     def set_trace_context(self, trace_id: str, task_id: Optional[str] = None):
         """Set trace context for current execution"""
@@ -35,17 +60,14 @@ class EnhancedLogger:
     @contextmanager
     def trace_context(self, trace_id: Optional[str] = None, task_id: Optional[str] = None):
         """Context manager for trace logging"""
-        old_trace_id = self.current_trace_id
-        old_task_id = self.current_task_id
-        
-        self.current_trace_id = trace_id or self.generate_trace_id()
-        self.current_task_id = task_id
+        trace_token = self._trace_id_var.set(trace_id or self.generate_trace_id())
+        task_token = self._task_id_var.set(task_id)
         
         try:
             yield self.current_trace_id
         finally:
-            self.current_trace_id = old_trace_id
-            self.current_task_id = old_task_id
+            self._trace_id_var.reset(trace_token)
+            self._task_id_var.reset(task_token)
     
     def _get_extra_context(self, **kwargs) -> Dict[str, Any]:
         """Get extra context for logging"""
@@ -0,0 +1,56 @@
+from opentelemetry import metrics
+from loguru import logger
+
+from app.core.config import settings
+
+
+meter = metrics.get_meter("mandas.agent_worker")
+
+task_claim_duration = meter.create_histogram(
+    "mandas.worker.task_claim.duration",
+    unit="ms",
+    description="Latency of the conditional UPDATE ... RETURNING that claims a queued task"
+)
+
+embedding_cache_lookups = meter.create_counter(
+    "mandas.worker.embedding_cache.lookups",
+    description="Embedding cache lookups by the tier that answered (memory, snapshot, redis, miss)"
+)
+
+
+def _metric_reader(exporter: str):
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    
+    interval = settings.metrics_export_interval * 1000
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        return PeriodicExportingMetricReader(
+            OTLPMetricExporter(endpoint=settings.metrics_otlp_endpoint),
+            export_interval_millis=interval
+        )
+    if exporter == "prometheus":
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+        from prometheus_client import start_http_server
+        start_http_server(settings.metrics_prometheus_port)
+        return PrometheusMetricReader()
+    if exporter == "console":
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter
+        return PeriodicExportingMetricReader(ConsoleMetricExporter(), export_interval_millis=interval)
+    raise ValueError(f"Unknown metrics exporter {exporter!r}")
+
+
+def setup_metrics():
+    exporter = settings.metrics_exporter.lower()
+    if exporter == "none":
+        # 未配置 MeterProvider 时所有指标均为空操作
+        logger.info("Metrics export disabled (METRICS_EXPORTER=none)")
+        return
+    
+    try:
+        from opentelemetry.sdk.metrics import MeterProvider
+        
+        metrics.set_meter_provider(MeterProvider(metric_readers=[_metric_reader(exporter)]))
+        
+        logger.info(f"Agent Worker OpenTelemetry metrics setup completed ({exporter} exporter)")
+    except Exception as e:
+        logger.warning(f"Failed to setup metrics: {e}")
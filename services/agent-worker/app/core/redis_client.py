@@ -1,6 +1,7 @@
 import redis.asyncio as redis
 from loguru import logger
 from app.core.config import settings
+from app.core.task_streams import LANES, stream_for_lane
 
 
 redis_client: redis.Redis = None
@@ -13,19 +14,21 @@ async def init_redis():
         await redis_client.ping()
         logger.info("Redis connection established successfully")
         
-        try:
-            await redis_client.xgroup_create(
-                settings.redis_task_stream,
-                settings.redis_consumer_group,
-                id="0",
-                mkstream=True
-            )
-            logger.info(f"Created consumer group: {settings.redis_consumer_group}")
-        except redis.ResponseError as e:
-            if "BUSYGROUP" in str(e):
-                logger.info(f"Consumer group {settings.redis_consumer_group} already exists")
-            else:
-                raise
+        for lane in LANES:
+            stream = stream_for_lane(lane)
+            try:
+                await redis_client.xgroup_create(
+                    stream,
+                    settings.redis_consumer_group,
+                    id="0",
+                    mkstream=True
+                )
+                logger.info(f"Created consumer group {settings.redis_consumer_group} on {stream}")
+            except redis.ResponseError as e:
+                if "BUSYGROUP" in str(e):
+                    logger.info(f"Consumer group {settings.redis_consumer_group} already exists on {stream}")
+                else:
+                    raise
                 
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
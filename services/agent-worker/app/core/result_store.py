@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from app.core.config import settings
+
+
+def _compress(data: bytes) -> tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=settings.result_compression_level).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+class ResultStore:
+    """Keeps large task results as compressed blobs outside the tasks table.
+
+    Results up to ``result_inline_max_bytes`` stay inline. Larger ones are
+    written to ``result_store_path`` and the row keeps only the small
+    top-level fields plus a ``result_ref`` manifest the gateway uses to
+    stream the full payload back. Blobs older than
+    ``result_store_retention_days`` are deleted by ``purge_expired``; the
+    gateway then answers 410 for that result.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.result_store_path)
+
+    def blob_key(self, task_id: str, codec: str) -> str:
+        return f"{task_id[:2]}/{task_id}.json.{codec}"
+
+    async def offload(self, task_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Return what to store in ``Task.result``: the result itself or a summary with a manifest."""
+        raw = json.dumps(result, ensure_ascii=False, default=str).encode("utf-8")
+        if len(raw) <= settings.result_inline_max_bytes:
+            return result
+
+        codec, blob = await asyncio.to_thread(_compress, raw)
+        key = self.blob_key(task_id, codec)
+        await asyncio.to_thread(self._write, key, blob)
+
+        summary, omitted = {}, []
+        for field, value in result.items():
+            size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+            if size <= settings.result_summary_field_max_bytes:
+                summary[field] = value
+            else:
+                omitted.append(field)
+
+        summary["result_ref"] = {
+            "storage": "fs",
+            "key": key,
+            "codec": codec,
+            "size": len(raw),
+            "stored_size": len(blob),
+            "sha256": hashlib.sha256(raw).hexdigest(),
+            "omitted_fields": omitted
+        }
+        logger.info(f"Task {task_id} result offloaded: {len(raw)} -> {len(blob)} bytes ({codec})")
+        return summary
+
+    async def purge_expired(self) -> int:
+        if settings.result_store_retention_days <= 0:
+            return 0
+        return await asyncio.to_thread(self._purge_expired)
+
+    def _purge_expired(self) -> int:
+        cutoff = time.time() - settings.result_store_retention_days * 86400
+        removed = 0
+        if not self.root.is_dir():
+            return 0
+        # 同样清理崩溃遗留的临时文件；多个 worker 同时清理时忽略已被删除的文件
+        for path in self.root.glob("*/*"):
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"Purged {removed} task result blobs older than {settings.result_store_retention_days} days")
+        return removed
+
+    def _write(self, key: str, blob: bytes):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，网关不会读到半个文件
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
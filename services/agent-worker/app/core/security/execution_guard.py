@@ -8,6 +8,7 @@ from dataclasses import dataclass
 
 from app.core.config import settings
 from app.core.tools.tool_registry import ToolRegistry
+from app.core.deadline import remaining_timeout
 
 
 @dataclass
@@ -73,10 +74,14 @@ class DockerSandbox:
             else:
                 shell_command = f'/bin/bash -c "{command}"'
             
-            result = container.exec_run(
-                shell_command,
-                stdout=True,
-                stderr=True
+            result = await asyncio.wait_for(
+                asyncio.to_thread(
+                    container.exec_run,
+                    shell_command,
+                    stdout=True,
+                    stderr=True
+                ),
+                timeout=remaining_timeout(timeout)
             )
             
             stdout = result.output.decode('utf-8') if result.output else ""
@@ -99,9 +104,10 @@ class DockerSandbox:
         container = self.active_containers.get(task_id)
         if container:
             try:
-                container.stop(timeout=10)
-                container.remove()
-                del self.active_containers[task_id]
+                # docker SDK 为同步调用，stop 最长阻塞 10 秒，放到线程中执行以免阻塞事件循环
+                await asyncio.to_thread(container.stop, timeout=10)
+                await asyncio.to_thread(container.remove)
+                self.active_containers.pop(task_id, None)
                 logger.info(f"Cleaned up container for task {task_id}")
             except Exception as e:
                 logger.error(f"Failed to cleanup container for task {task_id}: {e}")
@@ -0,0 +1,24 @@
+from app.core.config import settings
+
+
+# 按优先级从高到低排列；数值越小优先级越高（与 Task.priority 一致）
+LANES = ("high", "normal", "low")
+
+
+def lane_for_priority(priority: int) -> str:
+    if priority <= settings.priority_high_max:
+        return "high"
+    if priority >= settings.priority_low_min:
+        return "low"
+    return "normal"
+
+
+def stream_for_lane(lane: str) -> str:
+    """normal 通道沿用原有的任务流，保证旧消息仍会被消费"""
+    if lane == "normal":
+        return settings.redis_task_stream
+    return f"{settings.redis_task_stream}:{lane}"
+
+
+def stream_for_priority(priority: int) -> str:
+    return stream_for_lane(lane_for_priority(priority))
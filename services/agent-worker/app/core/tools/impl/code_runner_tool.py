@@ -3,6 +3,7 @@ import os
 import asyncio
 from typing import Dict, Any
 from app.core.base_tool import BaseTool, ToolMetadata
+from app.core.deadline import remaining_timeout
 
 
 class CodeRunnerTool(BaseTool):
@@ -67,10 +68,14 @@ class CodeRunnerTool(BaseTool):
                     stderr=asyncio.subprocess.PIPE
                 )
                 
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=self.metadata.timeout
-                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(
+                        process.communicate(), 
+                        timeout=remaining_timeout(self.metadata.timeout)
+                    )
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    process.kill()
+                    raise
                 
                 result = {
                     "success": process.returncode == 0,
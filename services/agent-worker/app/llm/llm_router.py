@@ -3,6 +3,7 @@ from typing import Dict, Any, List, Optional
 from loguru import logger
 
 from app.core.config import settings
+from app.core.deadline import remaining_timeout
 
 
 class LLMRouter:
@@ -86,7 +87,9 @@ class LLMRouter:
             }
             
             logger.debug(f"Sending request to Ollama: {payload}")
-            response = await self.ollama_client.post("/api/generate", json=payload)
+            response = await self.ollama_client.post(
+                "/api/generate", json=payload, timeout=remaining_timeout(30.0)
+            )
             logger.debug(f"Ollama response status: {response.status_code}")
             
             if response.status_code == 200:
@@ -128,7 +131,9 @@ class LLMRouter:
             }
             
             logger.debug(f"Sending chat request to Ollama: {payload}")
-            response = await self.ollama_client.post("/api/chat", json=payload)
+            response = await self.ollama_client.post(
+                "/api/chat", json=payload, timeout=remaining_timeout(30.0)
+            )
             logger.debug(f"Ollama chat response status: {response.status_code}")
             
             if response.status_code == 200:
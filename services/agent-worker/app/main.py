@@ -8,6 +8,7 @@ from app.core.database import init_db
 from app.core.redis_client import init_redis
 from app.core.logging.enhanced_logger import setup_logging
 from app.core.tracing import setup_tracing
+from app.core.metrics import setup_metrics
 from app.worker.task_consumer import TaskConsumer
 
 
@@ -19,6 +20,7 @@ class AgentWorkerService:
     async def start(self):
         setup_logging()
         setup_tracing()
+        setup_metrics()
         
         await init_db()
         await init_redis()
@@ -45,7 +47,9 @@ class AgentWorkerService:
         logger.info("Agent Worker shutdown complete")
 
     def handle_signal(self, signum, frame):
-        logger.info(f"Received signal {signum}, initiating shutdown...")
+        logger.info(f"Received signal {signum}, draining in-flight tasks...")
+        if self.task_consumer:
+            self.task_consumer.begin_drain()
         asyncio.create_task(self.stop())
 
 
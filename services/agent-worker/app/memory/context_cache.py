@@ -0,0 +1,60 @@
+import hashlib
+import json
+import uuid
+from typing import Optional
+from loguru import logger
+
+from app.core.config import settings
+from app.memory.lru_cache import LRUCache
+
+
+class ContextCache:
+    """Cache of built LLM contexts, shared by all workers.
+
+    Keys are ``{prefix}:{namespace}:{version}:{sha256(query)}``. The version
+    is an opaque token stored in Redis per namespace (one per task) and
+    replaced by ``bump`` whenever that namespace's memory is written, so
+    readers never see a context built before the write. Entries are looked
+    up in an in-process LRU first, then in Redis.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.prefix = settings.context_cache_key_prefix
+        self.memory: LRUCache[str] = LRUCache(settings.context_cache_size)
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:version:{namespace}"
+
+    async def key_for(self, namespace: str, query: str) -> str:
+        version = await self.redis_client.get(self._version_key(namespace))
+        if isinstance(version, bytes):
+            version = version.decode()
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{namespace}:{version or '0'}:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        cached = await self.redis_client.get(key)
+        if cached is None:
+            return None
+        value = json.loads(cached)
+        self.memory.put(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        self.memory.put(key, value)
+        await self.redis_client.set(key, json.dumps(value), ex=settings.context_cache_ttl)
+
+    async def bump(self, namespace: str):
+        """Invalidate every cached context of ``namespace``"""
+        try:
+            # 随机版本号而非自增：版本键过期后重新计数也不会撞上旧条目
+            await self.redis_client.set(
+                self._version_key(namespace), uuid.uuid4().hex[:12], ex=settings.context_version_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Failed to invalidate context cache for {namespace}: {e}")
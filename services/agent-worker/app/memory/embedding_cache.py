@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import embedding_cache_lookups
+from app.memory.lru_cache import LRUCache
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by sha256(model, text).
+
+    Lookups go through an in-process LRU, then the memory-mapped snapshot
+    left by the previous run (if ``embedding_cache_snapshot_path`` is set),
+    then Redis, where vectors are stored as float16 bytes shared by all
+    workers. ``save_snapshot`` writes the hottest entries back to disk on
+    shutdown. Cache failures only cost a re-encode.
+    """
+
+    TIERS = ("memory", "snapshot", "redis", "miss")
+
+    def __init__(self, redis_client, model_name: str, snapshot_path: str = None):
+        self.redis_client = redis_client
+        self.model_name = model_name
+        self.memory: LRUCache[np.ndarray] = LRUCache(settings.embedding_cache_size)
+        snapshot_path = snapshot_path or settings.embedding_cache_snapshot_path
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.stats: Dict[str, int] = {tier: 0 for tier in self.TIERS}
+        self._snapshot = None
+        self._snapshot_index: Dict[str, int] = {}
+        self._load_snapshot()
+
+    def digest(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _redis_key(self, digest: str) -> str:
+        return f"{settings.embedding_cache_key_prefix}:{digest}"
+
+    def _record(self, tier: str, count: int = 1):
+        if count:
+            self.stats[tier] += count
+            embedding_cache_lookups.add(count, {"tier": tier})
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        digests = [self.digest(text) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing = []
+
+        for i, digest in enumerate(digests):
+            vector = self.memory.get(digest)
+            if vector is not None:
+                found[i] = vector
+                self._record("memory")
+                continue
+
+            row = self._snapshot_index.get(digest)
+            if row is not None:
+                vector = np.array(self._snapshot["vec"][row])
+                self.memory.put(digest, vector)
+                found[i] = vector
+                self._record("snapshot")
+                continue
+
+            missing.append(i)
+
+        if missing and self.redis_client is not None:
+            try:
+                values = await self.redis_client.mget([self._redis_key(digests[i]) for i in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis lookup failed: {e}")
+                values = [None] * len(missing)
+
+            still_missing = []
+            for i, value in zip(missing, values):
+                if value is None:
+                    still_missing.append(i)
+                    continue
+                vector = np.frombuffer(value, dtype=np.float16)
+                self.memory.put(digests[i], vector)
+                found[i] = vector
+                self._record("redis")
+            missing = still_missing
+
+        self._record("miss", len(missing))
+        return [vector.astype(np.float32).tolist() if vector is not None else None for vector in found]
+
+    async def put_many(self, texts: List[str], vectors: List[List[float]]):
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            digest = self.digest(text)
+            compact = np.asarray(vector, dtype=np.float16)
+            self.memory.put(digest, compact)
+            entries[digest] = compact
+
+        if not entries or self.redis_client is None:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for digest, compact in entries.items():
+                    pipe.set(self._redis_key(digest), compact.tobytes(), ex=settings.embedding_cache_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    def _load_snapshot(self):
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return
+        try:
+            self._snapshot = np.load(self.snapshot_path, mmap_mode="r")
+            self._snapshot_index = {
+                key.decode(): row for row, key in enumerate(self._snapshot["key"].tolist())
+            }
+            logger.info(f"Loaded {len(self._snapshot_index)} embeddings from {self.snapshot_path}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding snapshot {self.snapshot_path}: {e}")
+            self._snapshot = None
+            self._snapshot_index = {}
+
+    async def save_snapshot(self):
+        if self.snapshot_path is not None:
+            await asyncio.to_thread(self._write_snapshot)
+
+    def _write_snapshot(self):
+        # 最近使用的条目优先，其次保留旧快照中的条目
+        entries: Dict[str, np.ndarray] = {}
+        for digest, vector in reversed(list(self.memory.items())):
+            entries[digest] = vector
+        for digest, row in self._snapshot_index.items():
+            if len(entries) >= settings.embedding_cache_snapshot_max_entries:
+                break
+            entries.setdefault(digest, self._snapshot["vec"][row])
+
+        if not entries:
+            return
+        dim = len(next(iter(entries.values())))
+        items = [(digest, vector) for digest, vector in entries.items() if len(vector) == dim]
+        items = items[:settings.embedding_cache_snapshot_max_entries]
+
+        table = np.zeros(len(items), dtype=[("key", "S64"), ("vec", "<f2", (dim,))])
+        for row, (digest, vector) in enumerate(items):
+            table[row] = (digest.encode(), vector)
+
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_name(f"{self.snapshot_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, self.snapshot_path)
+        logger.info(f"Saved {len(items)} embeddings to {self.snapshot_path}")
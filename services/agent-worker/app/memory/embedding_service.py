@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+from loguru import logger
+
+from app.core.config import settings
+
+
+class EmbeddingService:
+    """Gathers concurrent encode calls into batches for the embedding model.
+
+    A batch is sent when ``embedding_batch_max_size`` texts are waiting or
+    ``embedding_batch_wait_ms`` after the first one arrived, whichever comes
+    first. Batches run on a dedicated thread pool (the model releases the
+    GIL while encoding), so the event loop keeps serving other tasks. With
+    a ``cache``, only texts it has not seen before reach the model.
+    """
+
+    def __init__(self, model, max_batch_size: int = None, max_wait_ms: float = None, cache=None):
+        self.model = model
+        self.cache = cache
+        self.max_batch_size = max_batch_size or settings.embedding_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.embedding_batch_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.embedding_workers, thread_name_prefix="embedding"
+        )
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def encode(self, text: str) -> List[float]:
+        return (await self.encode_many([text]))[0]
+
+    async def encode_many(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.cache is None:
+            return await self._submit(texts)
+
+        vectors = await self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, await self._submit(missing)))
+            await self.cache.put_many(list(encoded), list(encoded.values()))
+            vectors = [vector if vector is not None else encoded[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    async def _submit(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future))
+            futures.append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        # 同一批次内的重复文本只编码一次
+        texts = list(dict.fromkeys(text for text, future in batch if not future.done()))
+        if not texts:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=len(texts)).tolist()
+
+    def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -2,6 +2,7 @@ import asyncio
 import json
 import time
 import random
+import uuid
 from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
 import chromadb
@@ -10,6 +11,10 @@ from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 from app.core.config import settings
+from app.memory.embedding_service import EmbeddingService
+from app.memory.embedding_cache import EmbeddingCache
+from app.memory.single_flight import SingleFlight
+from app.memory.context_cache import ContextCache
 
 
 class BaseMemory(ABC):
@@ -60,6 +65,36 @@ class ShortTermMemory(BaseMemory):
             logger.error(f"Error adding message to short-term memory: {e}")
             raise
     
+    async def add_messages(self, key: str, messages: List[Dict[str, Any]], ttl: Optional[int] = None):
+        """Append several messages in one MULTI pipeline, keeping their order"""
+        if not messages:
+            return
+        try:
+            redis_key = f"user:{key}:history" if not key.startswith("user:") else f"{key}:history"
+            full_key = f"memory:short:{redis_key}"
+            
+            if full_key not in self._locks:
+                self._locks[full_key] = asyncio.Lock()
+            
+            async with self._locks[full_key]:
+                async with self.redis_client.pipeline(transaction=True) as pipe:
+                    base = time.time() * 1000000000
+                    mapping = {}
+                    for i, message in enumerate(messages):
+                        value = json.dumps(message, ensure_ascii=False)
+                        # 分数按顺序递增，保证批量写入的消息保持原有先后顺序
+                        mapping[value] = base + i * 1000000 + random.randint(0, 999)
+                    
+                    pipe.zadd(full_key, mapping)
+                    pipe.expire(full_key, ttl if ttl else 300)
+                    pipe.zremrangebyrank(full_key, 0, -51)
+                    
+                    await pipe.execute()
+            
+        except Exception as e:
+            logger.error(f"Error adding messages to short-term memory: {e}")
+            raise
+    
     async def get_history(self, key: str, limit: int = 10) -> List[Dict[str, Any]]:
         try:
             redis_key = f"user:{key}:history" if not key.startswith("user:") else f"{key}:history"
@@ -87,10 +122,10 @@ class ShortTermMemory(BaseMemory):
 
 class LongTermMemory(BaseMemory):
     
-    def __init__(self, chroma_client, collection, embedding_model):
+    def __init__(self, chroma_client, collection, embedding_service: EmbeddingService):
         self.chroma_client = chroma_client
         self.collection = collection
-        self.embedding_model = embedding_model
+        self.embedding_service = embedding_service
     
     async def add_message(self, key: str, message: Dict[str, Any], ttl: Optional[int] = None):
         try:
@@ -98,24 +133,52 @@ class LongTermMemory(BaseMemory):
             if len(content) < 50:  # 只存储有意义的长内容
                 return
             
-            embedding = self.embedding_model.encode([content])[0].tolist()
+            embedding = await self.embedding_service.encode(content)
             
-            doc_id = f"{key}_{int(time.time())}"
             self.collection.add(
                 documents=[content],
                 embeddings=[embedding],
-                metadatas=[{
-                    "key": key,
-                    "type": "conversation",
-                    "timestamp": time.time(),
-                    **message
-                }],
-                ids=[doc_id]
+                metadatas=[self._metadata(key, message)],
+                ids=[self._doc_id(key)]
             )
             
         except Exception as e:
             logger.error(f"Error adding message to long-term memory: {e}")
     
+    async def add_messages(self, key: str, messages: List[Dict[str, Any]], ttl: Optional[int] = None):
+        """Embed the messages in one batch and store them with a single Chroma add"""
+        try:
+            messages = [msg for msg in messages if len(msg.get("content", "")) >= 50]
+            if not messages:
+                return
+            
+            documents = [msg["content"] for msg in messages]
+            embeddings = await self.embedding_service.encode_many(documents)
+            
+            self.collection.add(
+                documents=documents,
+                embeddings=embeddings,
+                metadatas=[self._metadata(key, msg) for msg in messages],
+                ids=[self._doc_id(key) for _ in messages]
+            )
+            
+        except Exception as e:
+            logger.error(f"Error adding messages to long-term memory: {e}")
+    
+    @staticmethod
+    def _doc_id(key: str) -> str:
+        # 同一秒内写入的多条消息也需要唯一 ID
+        return f"{key}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    
+    @staticmethod
+    def _metadata(key: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "key": key,
+            "type": "conversation",
+            "timestamp": time.time(),
+            **message
+        }
+    
     async def get_history(self, key: str, limit: int = 10) -> List[Dict[str, Any]]:
         try:
             results = self.collection.query(
@@ -144,7 +207,7 @@ class LongTermMemory(BaseMemory):
     
     async def query_knowledge(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
         try:
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
+            query_embedding = await self.embedding_service.encode(query)
             
             results = self.collection.query(
                 query_embeddings=[query_embedding],
@@ -178,10 +241,12 @@ class MemoryManager:
         self.chroma_client = None
         self.collection = None
         self.embedding_model = None
+        self.embedding_service = None
+        self.embedding_cache = None
+        self.single_flight = None
         self.short_term_memory = None
         self.long_term_memory = None
-        self._context_cache = {}
-        self._cache_ttl = 60
+        self.context_cache = None
     
     async def initialize(self):
         """Initialize memory manager with Redis and ChromaDB connections"""
@@ -207,7 +272,7 @@ class MemoryManager:
             
             if self.collection is not None:
                 try:
-                    self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                    self.embedding_model = SentenceTransformer(settings.embedding_model)
                 except Exception as e:
                     logger.warning(f"Embedding model initialization failed: {e}, disabling long-term memory")
                     self.collection = None
@@ -216,10 +281,14 @@ class MemoryManager:
                 self.embedding_model = None
             
             self.short_term_memory = ShortTermMemory(self.redis_client)
+            self.single_flight = SingleFlight(self.redis_client)
+            self.context_cache = ContextCache(self.redis_client)
             
             if self.collection is not None and self.embedding_model is not None:
+                self.embedding_cache = EmbeddingCache(self.redis_client, settings.embedding_model)
+                self.embedding_service = EmbeddingService(self.embedding_model, cache=self.embedding_cache)
                 self.long_term_memory = LongTermMemory(
-                    self.chroma_client, self.collection, self.embedding_model
+                    self.chroma_client, self.collection, self.embedding_service
                 )
                 logger.info("Long-term memory (ChromaDB) enabled")
             else:
@@ -235,9 +304,25 @@ class MemoryManager:
             self.chroma_client = None
             self.collection = None
             self.embedding_model = None
+            self.embedding_service = None
+            self.embedding_cache = None
+            self.single_flight = None
+            self.context_cache = None
             self.short_term_memory = None
             self.long_term_memory = None
     
+    async def close(self):
+        """Persist the embedding cache snapshot and stop background workers"""
+        if self.single_flight is not None:
+            await self.single_flight.close()
+        if self.embedding_cache is not None:
+            try:
+                await self.embedding_cache.save_snapshot()
+            except Exception as e:
+                logger.warning(f"Failed to save embedding cache snapshot: {e}")
+        if self.embedding_service is not None:
+            self.embedding_service.close()
+    
     async def _acquire_lock(self, lock_key: str, timeout: int = 5) -> bool:
         """Acquire distributed lock using Redis SETNX"""
         try:
@@ -283,54 +368,57 @@ class MemoryManager:
 
     async def get_context_for_llm(self, query: str, task_id: str) -> str:
         try:
-            lock_key = f"lock:context:{task_id}"
-            if not await self.acquire_lock(lock_key):
-                logger.warning(f"Failed to acquire lock for context {task_id}")
-                return "系统繁忙，请稍后重试。"
-            
-            try:
-                cache_key = f"context:{task_id}:{hash(query)}"
-                cached_context = await self.redis_client.get(cache_key)
-                if cached_context:
-                    return json.loads(cached_context)
-                
-                short_history = await self.short_term_memory.get_history(task_id, limit=5)
-                await asyncio.sleep(0.01)  # 小延迟确保操作顺序
-                
-                knowledge = await self.long_term_memory.query_knowledge(query, limit=3) if self.long_term_memory else []
-                
-                context_parts = []
-                
-                if short_history:
-                    context_parts.append("**最近对话历史**:")
-                    for msg in short_history:
-                        name = msg.get("name", "unknown")
-                        content = msg.get("content", "")[:200]
-                        context_parts.append(f"- {name}: {content}")
-                
-                if knowledge:
-                    context_parts.append("\n**相关知识库内容**:")
-                    for item in knowledge:
-                        source = item.get("source", "unknown")
-                        content = item.get("content", "")
-                        context_parts.append(f"- [{source}]: {content}")
-                
-                if not context_parts:
-                    result = "暂无相关历史记录和知识库内容。"
-                else:
-                    result = "\n".join(context_parts)
-                
-                await self.redis_client.set(cache_key, json.dumps(result), ex=self._cache_ttl)
-                
-                return result
-                
-            finally:
-                await self.release_lock(lock_key)
+            cache_key = await self.context_cache.key_for(task_id, query)
+            cached_context = await self.context_cache.get(cache_key)
+            if cached_context is not None:
+                return cached_context
+            
+            # 相同任务与查询的并发请求（包括其他 worker 上的）共享同一次计算
+            return await self.single_flight.do(
+                cache_key,
+                lambda: self._build_context(query, task_id, cache_key),
+                lookup=lambda: self.context_cache.get(cache_key)
+            )
             
         except Exception as e:
             logger.error(f"Error getting context for LLM: {e}")
             return "获取上下文时出现错误。"
     
+    async def _build_context(self, query: str, task_id: str, cache_key: str) -> str:
+        cached_context = await self.context_cache.get(cache_key)
+        if cached_context is not None:
+            return cached_context
+        
+        short_history, knowledge = await asyncio.gather(
+            self.short_term_memory.get_history(task_id, limit=5),
+            self.long_term_memory.query_knowledge(query, limit=3) if self.long_term_memory else asyncio.sleep(0, [])
+        )
+        
+        context_parts = []
+        
+        if short_history:
+            context_parts.append("**最近对话历史**:")
+            for msg in short_history:
+                name = msg.get("name", "unknown")
+                content = msg.get("content", "")[:200]
+                context_parts.append(f"- {name}: {content}")
+        
+        if knowledge:
+            context_parts.append("\n**相关知识库内容**:")
+            for item in knowledge:
+                source = item.get("source", "unknown")
+                content = item.get("content", "")
+                context_parts.append(f"- [{source}]: {content}")
+        
+        if not context_parts:
+            result = "暂无相关历史记录和知识库内容。"
+        else:
+            result = "\n".join(context_parts)
+        
+        await self.context_cache.set(cache_key, result)
+        
+        return result
+    
     async def remember(self, task_id: str, message: Dict[str, Any], short_term: bool = True, long_term: bool = False, ttl: Optional[int] = None):
         try:
             tasks = []
@@ -342,6 +430,7 @@ class MemoryManager:
             
             if tasks:
                 await asyncio.gather(*tasks, return_exceptions=True)
+                await self.context_cache.bump(task_id)
                 
         except Exception as e:
             logger.error(f"Error in remember: {e}")
@@ -349,17 +438,21 @@ class MemoryManager:
     
     async def store_conversation(self, task_id: str, conversation: List[Dict[str, Any]]):
         try:
-            for msg in conversation:
-                await self.short_term_memory.add_message(task_id, msg)
-            
             important_messages = [
                 msg for msg in conversation 
                 if len(msg.get("content", "")) > 100 or msg.get("name") == "Reviewer"
             ]
             
+            writes = [self.short_term_memory.add_messages(task_id, conversation)]
             if self.long_term_memory:
-                for msg in important_messages:
-                    await self.long_term_memory.add_message(task_id, msg)
+                writes.append(self.long_term_memory.add_messages(task_id, important_messages))
+            
+            results = await asyncio.gather(*writes, return_exceptions=True)
+            # 写入后再换版本号，之前缓存的上下文全部失效
+            await self.context_cache.bump(task_id)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
             
             logger.info(f"Stored conversation for task {task_id}")
             
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from loguru import logger
+
+from app.core.config import settings
+
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _LeaderCancelled(Exception):
+    """Tells local followers to retry after their leader was cancelled"""
+
+
+class SingleFlight:
+    """Coalesces concurrent computations of the same key.
+
+    Callers in one process share a future. Across workers the first caller
+    takes a Redis lock and publishes its JSON result on
+    ``{single_flight_key_prefix}:done:<key>``; the others wait for that
+    message on one pattern subscription per process. A leader that stores
+    its result somewhere readable before returning should pass ``lookup``:
+    followers call it once subscribed, so a result published before they
+    started listening is not missed. A follower computes the value itself
+    only if the leader is gone or silent for ``single_flight_wait_timeout``
+    seconds, so no caller is ever turned away.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.prefix = settings.single_flight_key_prefix
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._remote_waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._subscribed = asyncio.Event()
+        self._listener: Optional[asyncio.Task] = None
+        self._release_lock = redis_client.register_script(RELEASE_LOCK_SCRIPT) if redis_client else None
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # 领导者被取消不代表跟随者也要放弃：重新进入，第一个重试者成为新的领导者
+                return await self.do(key, fn, lookup)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._do_shared(key, fn, lookup)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # 不能 future.cancel()：shield 会把取消传给等待中的跟随者
+            future.set_exception(_LeaderCancelled(key))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _do_shared(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]]
+    ) -> Any:
+        if self.redis_client is None:
+            return await fn()
+
+        lock_key = f"{self.prefix}:lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            leader = await self.redis_client.set(
+                lock_key, token, nx=True, ex=settings.single_flight_lock_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Single-flight lock for {key} unavailable: {e}")
+            return await fn()
+
+        if not leader:
+            found, result = await self._wait_for_leader(key, lock_key, lookup)
+            if found:
+                return result
+            return await fn()
+
+        try:
+            result = await fn()
+            try:
+                await self.redis_client.publish(
+                    f"{self.prefix}:done:{key}", json.dumps(result, ensure_ascii=False)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to publish single-flight result for {key}: {e}")
+            return result
+        finally:
+            try:
+                await self._release_lock(keys=[lock_key], args=[token])
+            except Exception as e:
+                logger.warning(f"Failed to release single-flight lock for {key}: {e}")
+
+    async def _wait_for_leader(
+        self, key: str, lock_key: str, lookup: Optional[Callable[[], Awaitable[Any]]]
+    ):
+        """Returns (True, result) if another worker's result arrived in time."""
+        self._ensure_listener()
+        waiter = asyncio.get_running_loop().create_future()
+        self._remote_waiters.setdefault(key, set()).add(waiter)
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=settings.single_flight_wait_timeout)
+            # 先订阅再查结果与锁：领导者在订阅前已发布的结果可从 lookup 读到，
+            # 锁已释放说明领导者已结束
+            if lookup is not None:
+                result = await lookup()
+                if result is not None:
+                    return True, result
+            if not await self.redis_client.exists(lock_key):
+                return False, None
+            return True, await asyncio.wait_for(waiter, timeout=settings.single_flight_wait_timeout)
+        except Exception as e:
+            logger.debug(f"Single-flight wait for {key} gave up: {e!r}")
+            return False, None
+        finally:
+            waiters = self._remote_waiters.get(key)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._remote_waiters[key]
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        prefix = f"{self.prefix}:done:"
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{prefix}*")
+                    self._subscribed.set()
+
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        channel = message["channel"]
+                        if isinstance(channel, bytes):
+                            channel = channel.decode()
+                        waiters = self._remote_waiters.get(channel[len(prefix):])
+                        if not waiters:
+                            continue
+                        result = json.loads(message["data"])
+                        for waiter in waiters:
+                            if not waiter.done():
+                                waiter.set_result(result)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Single-flight subscription failed: {e}, reconnecting")
+                self._subscribed.clear()
+                # 订阅中断期间可能错过结果，让等待者自行计算
+                for waiters in self._remote_waiters.values():
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(ConnectionError("single-flight subscription lost"))
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
@@ -0,0 +1,40 @@
+import time
+from typing import Dict
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 隔离时附加到死信条目上的字段，重放时会被移除
+DEAD_LETTER_FIELDS = ("dlq_reason", "dlq_detail", "source_stream", "source_id", "failed_at", "consumer")
+
+
+class DeadLetterQueue:
+    """Moves poison messages out of the task streams.
+
+    The original fields are copied to the dead-letter stream together with
+    the failure reason and source position, and the source entry is
+    acknowledged in the same transaction so it is never redelivered.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.stream = settings.redis_dead_letter_stream
+
+    async def quarantine(self, stream: str, msg_id: str, fields: Dict[str, str], reason: str, detail: str = ""):
+        entry = {
+            **{key: value for key, value in fields.items() if key not in DEAD_LETTER_FIELDS},
+            "dlq_reason": reason,
+            "dlq_detail": detail[:1000],
+            "source_stream": stream,
+            "source_id": msg_id,
+            "failed_at": str(int(time.time())),
+            "consumer": settings.redis_consumer_name
+        }
+        
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.xadd(self.stream, entry, maxlen=settings.dead_letter_maxlen, approximate=True)
+            pipe.xack(stream, settings.redis_consumer_group, msg_id)
+            await pipe.execute()
+        
+        logger.warning(f"Message {msg_id} from {stream} moved to dead-letter stream: {reason} {detail}")
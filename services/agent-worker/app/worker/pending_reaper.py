@@ -0,0 +1,80 @@
+from typing import Dict, List, Tuple
+from loguru import logger
+
+from app.core.config import settings
+
+
+class PendingReaper:
+    """Reclaims stream entries left in the consumer group's pending list.
+
+    A message stays pending until it is acknowledged. Running tasks refresh
+    their idle time with ``heartbeat``; entries whose idle time exceeds
+    ``pending_idle_timeout`` therefore belong to a consumer that died, and
+    ``reclaim`` moves them to this consumer with XAUTOCLAIM.
+    """
+
+    def __init__(self, redis_client, stream: str = None):
+        self.redis_client = redis_client
+        self.stream = stream or settings.redis_task_stream
+        self.group = settings.redis_consumer_group
+        self.consumer = settings.redis_consumer_name
+        self.min_idle_ms = settings.pending_idle_timeout * 1000
+        self._cursor = "0-0"
+
+    async def reclaim(self, count: int) -> List[Tuple[str, Dict[str, str]]]:
+        """Claim up to ``count`` stale entries, resuming the previous scan."""
+        response = await self.redis_client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.min_idle_ms,
+            start_id=self._cursor,
+            count=count
+        )
+        self._cursor = response[0]
+
+        messages = [(msg_id, fields) for msg_id, fields in response[1] if fields]
+        
+        # 已被 MAXLEN 裁剪的条目没有内容，直接确认以移出待处理列表
+        trimmed = [msg_id for msg_id, fields in response[1] if not fields]
+        if trimmed:
+            await self.redis_client.xack(self.stream, self.group, *trimmed)
+        
+        if messages:
+            logger.warning(
+                f"Reclaimed {len(messages)} stale pending entries from {self.stream}: "
+                f"{[msg_id for msg_id, _ in messages]}"
+            )
+        return messages
+
+    async def delivery_counts(self, msg_ids: List[str]) -> Dict[str, int]:
+        """Delivery counters of this consumer's pending entries, in one XPENDING call."""
+        if not msg_ids:
+            return {}
+        
+        ordered = sorted(msg_ids, key=lambda msg_id: tuple(int(part) for part in msg_id.split("-")))
+        entries = await self.redis_client.xpending_range(
+            self.stream,
+            self.group,
+            min=ordered[0],
+            max=ordered[-1],
+            count=len(ordered) + settings.worker_concurrency,
+            consumername=self.consumer
+        )
+        wanted = set(msg_ids)
+        return {
+            entry["message_id"]: entry["times_delivered"]
+            for entry in entries
+            if entry["message_id"] in wanted
+        }
+
+    async def heartbeat(self, msg_id: str):
+        """Reset the idle time of an entry this consumer is still working on."""
+        await self.redis_client.xclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=0,
+            message_ids=[msg_id],
+            justid=True
+        )
@@ -0,0 +1,53 @@
+import time
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+from app.core.task_streams import LANES
+
+
+class PriorityLaneScheduler:
+    """Decides how many free slots each priority lane gets per read cycle.
+
+    Slots are handed out with smooth weighted round-robin, so over time every
+    lane is read in proportion to its weight. A lane that has not been polled
+    for ``starvation_timeout`` seconds is moved to the front of the next plan.
+    """
+
+    def __init__(self, weights: Dict[str, int] = None, starvation_timeout: float = None):
+        weights = weights or settings.priority_lane_weights
+        self.weights = {lane: max(int(weights.get(lane, 0)), 0) for lane in LANES}
+        self.starvation_timeout = (
+            starvation_timeout if starvation_timeout is not None
+            else settings.priority_starvation_timeout
+        )
+        self._current = {lane: 0 for lane in LANES}
+        now = time.monotonic()
+        self._last_polled = {lane: now for lane in LANES}
+
+    def _pick(self) -> str:
+        total = sum(self.weights.values())
+        for lane in LANES:
+            self._current[lane] += self.weights[lane]
+        lane = max(LANES, key=lambda name: self._current[name])
+        self._current[lane] -= total
+        return lane
+
+    def plan(self, slots: int) -> List[Tuple[str, int]]:
+        """Return ``(lane, count)`` pairs in read order, summing to ``slots``."""
+        now = time.monotonic()
+        allocation: Dict[str, int] = {}
+
+        for lane in LANES:
+            if slots > 0 and now - self._last_polled[lane] > self.starvation_timeout:
+                allocation[lane] = 1
+                slots -= 1
+
+        if sum(self.weights.values()) > 0:
+            for _ in range(slots):
+                lane = self._pick()
+                allocation[lane] = allocation.get(lane, 0) + 1
+
+        return list(allocation.items())
+
+    def mark_polled(self, lane: str):
+        self._last_polled[lane] = time.monotonic()
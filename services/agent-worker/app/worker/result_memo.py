@@ -0,0 +1,38 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.core.config import settings
+
+
+def memo_key(user_id: str, prompt: str, config: Optional[Dict[str, Any]]) -> str:
+    """需与 api-gateway 的 task_dedup.memo_key 保持一致"""
+    canonical = json.dumps(
+        {"prompt": prompt, "config": config or {}},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{settings.task_memo_key_prefix}:{user_id}:{digest}"
+
+
+class ResultMemo:
+    """Remembers successfully completed tasks by user, prompt and config.
+
+    The gateway looks the key up when a client submits with
+    ``reuse_result=true`` and returns the earlier task instead of queueing
+    a duplicate. Entries expire after ``task_memo_window`` seconds.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    async def remember(self, user_id: str, prompt: str, config: Optional[Dict[str, Any]], task_id: str):
+        if settings.task_memo_window <= 0:
+            return
+        try:
+            await self.redis_client.set(
+                memo_key(user_id, prompt, config), task_id, ex=settings.task_memo_window
+            )
+        except Exception as e:
+            logger.warning(f"Failed to memoize result of task {task_id}: {e}")
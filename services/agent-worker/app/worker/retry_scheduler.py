@@ -0,0 +1,94 @@
+import asyncio
+import json
+import random
+import time
+from loguru import logger
+
+from app.core.config import settings
+from app.core.task_streams import LANES, stream_for_lane
+
+
+# 原子地把到期的重试条目移回对应优先级的任务流：XADD 与 ZREM 在同一脚本中执行，
+# 不会出现条目已移出有序集合却没有写入任务流的情况；多个 worker 同时轮询时每个条目只会被移动一次
+# KEYS: 重试有序集合, high/normal/low 任务流
+# ARGV: 当前时间, 批大小, priority_high_max, priority_low_min, 任务流 maxlen, 时间戳
+RELEASE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local entry = cjson.decode(member)
+    local priority = tonumber(entry['priority']) or 5
+    local stream = KEYS[3]
+    if priority <= tonumber(ARGV[3]) then
+        stream = KEYS[2]
+    elseif priority >= tonumber(ARGV[4]) then
+        stream = KEYS[4]
+    end
+    redis.call('XADD', stream, 'MAXLEN', '~', ARGV[5], '*',
+        'task_id', entry['task_id'],
+        'priority', tostring(priority),
+        'retry_count', tostring(tonumber(entry['retry_count']) or 0),
+        'timestamp', ARGV[6])
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+
+class RetryScheduler:
+    """Delays failed tasks in a sorted set keyed by due time.
+
+    ``schedule`` computes an exponential backoff with equal jitter; the
+    ``run`` loop moves due entries back onto their priority stream with one
+    script call per batch.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.key = settings.redis_retry_zset
+        self._release_due = redis_client.register_script(RELEASE_DUE_SCRIPT)
+        self.running = False
+
+    def backoff_delay(self, retry_count: int) -> float:
+        ceiling = min(
+            settings.retry_backoff_max,
+            settings.retry_backoff_base * (2 ** max(retry_count - 1, 0))
+        )
+        return random.uniform(ceiling / 2, ceiling)
+
+    async def schedule(self, task_id: str, retry_count: int, priority: int = 5) -> float:
+        delay = self.backoff_delay(retry_count)
+        member = json.dumps({"task_id": task_id, "priority": priority, "retry_count": retry_count})
+        await self.redis_client.zadd(self.key, {member: time.time() + delay})
+        logger.info(f"Task {task_id} retry {retry_count} scheduled in {delay:.1f}s")
+        return delay
+
+    async def release_due(self) -> int:
+        now = time.time()
+        released = await self._release_due(
+            keys=[self.key] + [stream_for_lane(lane) for lane in LANES],
+            args=[
+                now,
+                settings.retry_batch_size,
+                settings.priority_high_max,
+                settings.priority_low_min,
+                10000,
+                str(int(now))
+            ]
+        )
+        if released:
+            logger.info(f"Moved {released} due retries back onto the task streams")
+        return int(released)
+
+    async def run(self):
+        self.running = True
+        while self.running:
+            try:
+                released = await self.release_due()
+                if released >= settings.retry_batch_size:
+                    continue
+            except Exception as e:
+                logger.error(f"Error releasing due retries: {e}")
+            await asyncio.sleep(settings.retry_poll_interval)
+
+    def stop(self):
+        self.running = False
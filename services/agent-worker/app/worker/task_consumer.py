@@ -1,17 +1,30 @@
 import asyncio
 import json
+import math
+import time
 import uuid
-from typing import Dict, Any, Optional
+from datetime import timedelta
+from typing import Dict, Any, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import select, update, func, and_, or_
 from loguru import logger
-import aiohttp
 
 from app.core.config import settings
 from app.core.database import get_db, Task
 from app.core.redis_client import get_redis
+from app.core.metrics import task_claim_duration
+from app.core.deadline import deadline_scope
+from app.core.result_store import ResultStore
 from app.agents.agent_manager import AgentManager
 from app.tools.tool_executor import ToolExecutor
+from app.worker.pending_reaper import PendingReaper
+from app.core.task_streams import LANES, stream_for_lane
+from app.worker.priority_lanes import PriorityLaneScheduler
+from app.worker.retry_scheduler import RetryScheduler
+from app.worker.dead_letter import DeadLetterQueue
+from app.worker.task_events import TaskEventPublisher
+from app.worker.task_status import TaskStatusCache
+from app.worker.result_memo import ResultMemo
 
 
 class TaskConsumer:
@@ -20,36 +33,52 @@ class TaskConsumer:
         self.agent_manager = None
         self.tool_executor = None
         self.running = False
-        self.websocket_url = f"http://api-gateway:8080/mandas/v1/tasks"
+        self._task_slots = asyncio.Semaphore(settings.worker_concurrency)
+        # 正在执行的任务 -> (stream, msg_id, fields)，用于停机时释放消息
+        self._inflight: Dict[asyncio.Task, Tuple[str, str, Dict[str, str]]] = {}
+        self._stop_lock = asyncio.Lock()
+        self._stopped = False
+        # 消费循环未运行时置位；stop() 等它置位后再排空，避免漏掉最后一次读取启动的任务
+        self._consume_idle = asyncio.Event()
+        self._consume_idle.set()
+        self._reserved = 0
+        self.pending_reapers: Dict[str, PendingReaper] = {}
+        self.lane_scheduler = PriorityLaneScheduler()
+        self._reclaim_task = None
+        self._purge_task = None
+        self.retry_scheduler = None
+        self._retry_task = None
+        self.dead_letters = None
+        self.event_publisher = None
+        self.status_cache = None
+        self.result_memo = None
+        self.result_store = ResultStore()
     
     async def broadcast_step_update(self, task_id: str, step_update: Dict[str, Any]):
+        if step_update.get("step_id") is not None and step_update.get("status"):
+            await self.status_cache.set_step(task_id, step_update["step_id"], step_update["status"])
         try:
-            async with aiohttp.ClientSession() as session:
-                await session.post(
-                    f"{self.websocket_url}/{task_id}/broadcast",
-                    json={
-                        "type": "step_status_update",
-                        "payload": step_update
-                    }
-                )
+            await self.event_publisher.publish(task_id, "step_status_update", step_update)
         except Exception as e:
             logger.error(f"Failed to broadcast step update: {e}")
     
     async def broadcast_log(self, task_id: str, log_entry: Dict[str, Any]):
         try:
-            async with aiohttp.ClientSession() as session:
-                await session.post(
-                    f"{self.websocket_url}/{task_id}/broadcast",
-                    json={
-                        "type": "log",
-                        "payload": log_entry
-                    }
-                )
+            await self.event_publisher.publish(task_id, "log", log_entry)
         except Exception as e:
             logger.error(f"Failed to broadcast log: {e}")
 
     async def initialize(self):
         self.redis_client = await get_redis()
+        self.pending_reapers = {
+            stream_for_lane(lane): PendingReaper(self.redis_client, stream_for_lane(lane))
+            for lane in LANES
+        }
+        self.retry_scheduler = RetryScheduler(self.redis_client)
+        self.dead_letters = DeadLetterQueue(self.redis_client)
+        self.event_publisher = TaskEventPublisher(self.redis_client)
+        self.status_cache = TaskStatusCache(self.redis_client)
+        self.result_memo = ResultMemo(self.redis_client)
         
         from app.core.tools.tool_registry import ToolRegistry
         from app.core.security.execution_guard import ExecutionGuard
@@ -90,7 +119,8 @@ class TaskConsumer:
         }
         await self.group_chat_manager.initialize(llm_config)
         
-        self.agent_manager = AgentManager()
+        # 与 TaskConsumer 共用同一个 MemoryManager，避免两份嵌入缓存互相覆盖快照
+        self.agent_manager = AgentManager(memory_manager=self.memory_manager)
         self.tool_executor = ToolExecutor()
         await self.agent_manager.initialize()
         await self.tool_executor.initialize()
@@ -99,93 +129,294 @@ class TaskConsumer:
 
     async def start_consuming(self):
         self.running = True
-        logger.info("Starting task consumption from Redis Stream")
+        logger.info(
+            f"Starting task consumption from priority lanes {list(LANES)} "
+            f"(concurrency={settings.worker_concurrency})"
+        )
+        self._reclaim_task = asyncio.create_task(self._reclaim_loop())
+        self._purge_task = asyncio.create_task(self._result_purge_loop())
+        self._retry_task = asyncio.create_task(self.retry_scheduler.run())
         
-        while self.running:
+        self._consume_idle.clear()
+        try:
+            while self.running:
+                await self._reserve_slots()
+                if not self.running:
+                    self._release_reserved_slots()
+                    break
+                try:
+                    await self._read_lanes()
+                        
+                except Exception as e:
+                    logger.error(f"Error in task consumption loop: {e}")
+                    if self.running:
+                        await asyncio.sleep(5)
+                finally:
+                    self._release_reserved_slots()
+        finally:
+            self._consume_idle.set()
+
+    async def _read_lanes(self):
+        """Fill the reserved slots from the priority lanes."""
+        initial = self._reserved
+        
+        for lane, count in self.lane_scheduler.plan(self._reserved):
+            await self._read_lane(lane, min(count, self._reserved))
+        
+        # 按权重分配后仍有空闲槽位时，按优先级顺序从其他通道补齐
+        for lane in LANES:
+            if self._reserved <= 0:
+                break
+            await self._read_lane(lane, self._reserved)
+        
+        if self._reserved < initial:
+            return
+        
+        # 所有通道均为空：阻塞等待任一通道的新消息
+        messages = await self.redis_client.xreadgroup(
+            settings.redis_consumer_group,
+            settings.redis_consumer_name,
+            {stream_for_lane(lane): ">" for lane in LANES},
+            count=1,
+            block=1000
+        )
+        await self._dispatch_read(messages)
+
+    async def _read_lane(self, lane: str, count: int):
+        if count <= 0:
+            return
+        
+        messages = await self.redis_client.xreadgroup(
+            settings.redis_consumer_group,
+            settings.redis_consumer_name,
+            {stream_for_lane(lane): ">"},
+            count=count
+        )
+        self.lane_scheduler.mark_polled(lane)
+        await self._dispatch_read(messages)
+    
+    async def _dispatch_read(self, messages):
+        for stream, msgs in messages:
+            for msg_id, fields in msgs:
+                await self._take_slot()
+                if not self.running:
+                    # 读取期间已开始停机：不再启动任务，立即放回队列
+                    self._task_slots.release()
+                    await self._release_message(stream, msg_id, fields)
+                    continue
+                self._dispatch(stream, msg_id, fields)
+
+    async def _reserve_slots(self):
+        """Wait for at least one free execution slot and take every free one."""
+        await self._task_slots.acquire()
+        self._reserved = 1
+        while not self._task_slots.locked():
+            await self._task_slots.acquire()
+            self._reserved += 1
+
+    async def _take_slot(self):
+        """Use a reserved slot, or wait for one if the read returned extra messages."""
+        if self._reserved > 0:
+            self._reserved -= 1
+        else:
+            await self._task_slots.acquire()
+
+    def _release_reserved_slots(self):
+        for _ in range(self._reserved):
+            self._task_slots.release()
+        self._reserved = 0
+
+    def _dispatch(self, stream: str, msg_id: str, fields: Dict[str, str], reclaimed: bool = False):
+        """Run a message in its own task; the caller must hold a slot for it."""
+        task = asyncio.create_task(self._run_message(stream, msg_id, fields, reclaimed))
+        self._inflight[task] = (stream, msg_id, fields)
+        task.add_done_callback(lambda done: self._inflight.pop(done, None))
+
+    async def _run_message(self, stream: str, msg_id: str, fields: Dict[str, str], reclaimed: bool = False):
+        heartbeat = asyncio.create_task(self._heartbeat(stream, msg_id, fields.get("task_id")))
+        try:
+            await self.process_message(msg_id, fields, stream=stream, reclaimed=reclaimed)
+        except Exception as e:
+            logger.error(f"Unhandled error processing message {msg_id}: {e}")
+        finally:
+            heartbeat.cancel()
+            self._task_slots.release()
+
+    async def _heartbeat(self, stream: str, msg_id: str, task_id: Optional[str]):
+        """Keep the pending entry's idle time and the task's updated_at fresh while it runs."""
+        while True:
+            await asyncio.sleep(settings.task_heartbeat_interval)
             try:
-                messages = await self.redis_client.xreadgroup(
-                    settings.redis_consumer_group,
-                    settings.redis_consumer_name,
-                    {settings.redis_task_stream: ">"},
-                    count=1,
-                    block=1000
-                )
+                await self.pending_reapers[stream].heartbeat(msg_id)
+                if task_id:
+                    await self._touch_task(task_id)
+            except Exception as e:
+                logger.error(f"Failed to refresh lease for message {msg_id}: {e}")
+    
+    async def _touch_task(self, task_id: str):
+        async for db in get_db():
+            await db.execute(
+                update(Task)
+                .where(Task.id == uuid.UUID(task_id), Task.status == "RUNNING")
+                .values(updated_at=func.now())
+            )
+            await db.commit()
+
+    async def _reclaim_loop(self):
+        """Periodically take over entries abandoned by dead consumers."""
+        while self.running:
+            await asyncio.sleep(settings.pending_reclaim_interval)
+            
+            for stream, reaper in self.pending_reapers.items():
+                free = settings.worker_concurrency - len(self._inflight)
+                if free <= 0:
+                    break
                 
-                for stream, msgs in messages:
-                    for msg_id, fields in msgs:
-                        await self.process_message(msg_id, fields)
-                        
+                try:
+                    messages = await reaper.reclaim(count=free)
+                    deliveries = await reaper.delivery_counts([msg_id for msg_id, _ in messages])
+                except Exception as e:
+                    logger.error(f"Error reclaiming pending messages from {stream}: {e}")
+                    continue
+                
+                await self._dispatch_reclaimed(stream, messages, deliveries)
+
+    async def _dispatch_reclaimed(self, stream: str, messages, deliveries: Dict[str, int]):
+        """Start reclaimed entries; on shutdown or cancellation hand the rest back."""
+        remaining = list(messages)
+        try:
+            while remaining:
+                msg_id, fields = remaining[0]
+                if deliveries.get(msg_id, 0) > settings.max_delivery_count:
+                    await self._quarantine_poison_task(stream, msg_id, fields, deliveries[msg_id])
+                    remaining.pop(0)
+                    continue
+                
+                await self._task_slots.acquire()
+                if not self.running:
+                    self._task_slots.release()
+                    break
+                remaining.pop(0)
+                self._dispatch(stream, msg_id, fields, reclaimed=True)
+        finally:
+            # 停机或被取消时，已接管但未启动的条目立即放回队列，
+            # 而不是留在本消费者的待确认列表中等下一轮空闲超时
+            for msg_id, fields in remaining:
+                await self._release_message(stream, msg_id, fields, reclaimed=True)
+
+    async def _result_purge_loop(self):
+        """Delete result blobs past their retention."""
+        while self.running:
+            try:
+                await self.result_store.purge_expired()
             except Exception as e:
-                logger.error(f"Error in task consumption loop: {e}")
-                await asyncio.sleep(5)
+                logger.error(f"Error purging expired result blobs: {e}")
+            await asyncio.sleep(settings.result_store_purge_interval)
 
-    async def process_message(self, msg_id: str, fields: Dict[str, str]):
+    async def process_message(
+        self,
+        msg_id: str,
+        fields: Dict[str, str],
+        stream: Optional[str] = None,
+        reclaimed: bool = False
+    ):
+        stream = stream or settings.redis_task_stream
         task_id = fields.get("task_id")
-        if not task_id:
-            logger.error(f"No task_id in message {msg_id}")
+        try:
+            uuid.UUID(task_id or "")
+        except ValueError:
+            logger.error(f"Invalid task_id {task_id!r} in message {msg_id}")
+            await self._quarantine(stream, msg_id, fields, "invalid_task_id", f"task_id={task_id!r}")
             return
 
-        logger.info(f"Processing task {task_id} from message {msg_id}")
+        logger.info(f"Processing task {task_id} from message {msg_id} on {stream}")
         
         try:
             async for db in get_db():
-                result = await db.execute(select(Task).where(Task.id == uuid.UUID(task_id)))
-                task = result.scalar_one_or_none()
+                task = await self._claim_task(db, task_id, reclaimed)
                 
                 if not task:
-                    logger.error(f"Task {task_id} not found in database")
-                    await self.ack_message(msg_id)
-                    return
-                
-                if task.status != "QUEUED":
-                    logger.warning(f"Task {task_id} is not in QUEUED status: {task.status}")
-                    await self.ack_message(msg_id)
+                    if reclaimed and await self._is_running(db, task_id):
+                        # 原消费者仍在发送心跳，保留消息由它继续处理
+                        logger.warning(f"Task {task_id} is still running on a live worker, leaving message {msg_id} pending")
+                        return
+                    logger.warning(f"Task {task_id} not found or not claimable, skipping")
+                    await self.ack_message(msg_id, stream)
                     return
                 
                 await self.execute_task(db, task)
-                await self.ack_message(msg_id)
+                await self.ack_message(msg_id, stream)
                 
         except Exception as e:
             logger.error(f"Error processing task {task_id}: {e}")
             await self.handle_task_error(task_id, str(e))
 
-    async def execute_task(self, db: AsyncSession, task: Task):
+    async def _claim_task(self, db: AsyncSession, task_id: str, reclaimed: bool = False):
+        """Atomically move a task to RUNNING and load only what execution needs.
+        
+        Returns None when the task does not exist or another worker already
+        claimed it.
+        """
+        claimable = Task.status == "QUEUED"
+        if reclaimed:
+            # 消息空闲不代表原消费者已失效（可能只是事件循环被阻塞），
+            # 只接管心跳超过 pending_idle_timeout 未更新的 RUNNING 任务
+            stale_before = func.now() - timedelta(seconds=settings.pending_idle_timeout)
+            claimable = or_(claimable, and_(Task.status == "RUNNING", Task.updated_at < stale_before))
+        
+        started = time.perf_counter()
+        result = await db.execute(
+            update(Task)
+            .where(Task.id == uuid.UUID(task_id), claimable)
+            .values(status="RUNNING", updated_at=func.now())
+            .returning(Task.id, Task.user_id, Task.prompt, Task.config, Task.retry_count, Task.priority)
+        )
+        task = result.one_or_none()
+        await db.commit()
+        
+        if task is not None:
+            await self.status_cache.set_status(
+                task_id, "RUNNING", user_id=task.user_id, retry_count=task.retry_count or 0
+            )
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        task_claim_duration.record(elapsed_ms, {"claimed": task is not None, "reclaimed": reclaimed})
+        logger.debug(f"Claim of task {task_id} took {elapsed_ms:.1f}ms (claimed={task is not None})")
+        
+        return task
+
+    async def _is_running(self, db: AsyncSession, task_id: str) -> bool:
+        result = await db.execute(select(Task.status).where(Task.id == uuid.UUID(task_id)))
+        return result.scalar_one_or_none() == "RUNNING"
+
+    def _task_timeout(self, config: Dict[str, Any]) -> float:
+        """Per-task timeout from config, clamped to [min_task_timeout, max_task_timeout]."""
+        try:
+            requested = float(config.get("timeout") or settings.max_task_timeout)
+        except (TypeError, ValueError):
+            requested = settings.max_task_timeout
+        # 负数、NaN 等无效值按未配置处理，过小的正数提升到下限
+        if not math.isfinite(requested) or requested <= 0:
+            requested = settings.max_task_timeout
+        return max(min(requested, settings.max_task_timeout), settings.min_task_timeout)
+
+    async def execute_task(self, db: AsyncSession, task):
         task_id = str(task.id)
+        timeout = self._task_timeout(task.config or {})
         
         with self.logger.trace_context(task_id=task_id) as trace_id:
-            self.logger.info(f"Executing task {task_id}: {task.prompt[:100]}...")
+            self.logger.info(f"Executing task {task_id} (timeout {timeout:.0f}s): {task.prompt[:100]}...")
             
+            deadline = asyncio.timeout(timeout)
             try:
-                await db.execute(
-                    update(Task)
-                    .where(Task.id == task.id)
-                    .values(status="RUNNING", updated_at=func.now())
-                )
-                await db.commit()
-                
                 self.logger.log_task_transition(task_id, "QUEUED", "RUNNING")
                 
-                await self._pre_process_task(task_id, task.prompt, task.config or {})
-                
-                available_tools = [tool.name for tool in self.tool_registry.list_tools()]
-                routing_decision = await self.llm_router_agent.decide(
-                    task.prompt, available_tools, {"task_id": task_id, "trace_id": trace_id}
-                )
-                
-                self.logger.info(f"Routing decision for task {task_id}: {routing_decision}")
-                
-                if routing_decision.get("complexity") == "high" or len(available_tools) > 5:
-                    user_context = {"task_id": task_id, "trace_id": trace_id}
-                    result = await self.group_chat_manager.process_task(
-                        task_id, task.prompt, task.config or {}, user_context
-                    )
-                else:
-                    result = await self.default_agent.process_task(
-                        task_id, task.prompt, {"trace_id": trace_id, **(task.config or {})}
-                    )
-                
-                await self._post_execute(task_id, result)
+                with deadline_scope(timeout):
+                    async with deadline:
+                        result = await self._run_task(task_id, task, trace_id)
                 
+                succeeded = result.get("status") == "success"
+                result = await self.result_store.offload(task_id, result)
                 await db.execute(
                     update(Task)
                     .where(Task.id == task.id)
@@ -196,42 +427,148 @@ class TaskConsumer:
                     )
                 )
                 await db.commit()
+                await self.status_cache.set_status(task_id, "COMPLETED")
+                if succeeded:
+                    await self.result_memo.remember(str(task.user_id), task.prompt, task.config, task_id)
                 
                 self.logger.log_task_transition(task_id, "RUNNING", "COMPLETED")
                 self.logger.info(f"Task {task_id} completed successfully")
                 
-            except Exception as e:
-                self.logger.error(f"Task {task_id} execution failed: {e}")
-                
-                await self._on_failure(task_id, str(e))
-                
-                retry_count = task.retry_count + 1
-                if retry_count < settings.max_retry_count:
-                    await db.execute(
-                        update(Task)
-                        .where(Task.id == task.id)
-                        .values(
-                            status="QUEUED",
-                            retry_count=retry_count,
-                            updated_at=func.now()
-                        )
-                    )
-                    self.logger.log_task_transition(task_id, "RUNNING", "QUEUED")
-                    self.logger.info(f"Task {task_id} queued for retry ({retry_count}/{settings.max_retry_count})")
+            except TimeoutError as e:
+                if deadline.expired():
+                    await self._handle_timeout(db, task, timeout)
                 else:
-                    await db.execute(
-                        update(Task)
-                        .where(Task.id == task.id)
-                        .values(
-                            status="FAILED",
-                            result={"error": str(e)},
-                            updated_at=func.now()
-                        )
+                    await self._handle_failure(db, task, e)
+            except Exception as e:
+                await self._handle_failure(db, task, e)
+
+    async def _run_task(self, task_id: str, task, trace_id: str) -> Dict[str, Any]:
+        await self._pre_process_task(task_id, task.prompt, task.config or {})
+        
+        available_tools = [tool.name for tool in self.tool_registry.list_tools()]
+        routing_decision = await self.llm_router_agent.decide(
+            task.prompt, available_tools, {"task_id": task_id, "trace_id": trace_id}
+        )
+        
+        self.logger.info(f"Routing decision for task {task_id}: {routing_decision}")
+        
+        if routing_decision.get("complexity") == "high" or len(available_tools) > 5:
+            user_context = {"task_id": task_id, "trace_id": trace_id}
+            result = await self.group_chat_manager.process_task(
+                task_id, task.prompt, task.config or {}, user_context
+            )
+        else:
+            result = await self.default_agent.process_task(
+                task_id, task.prompt, {"trace_id": trace_id, **(task.config or {})}
+            )
+        
+        await self._post_execute(task_id, result)
+        return result
+
+    async def _handle_timeout(self, db: AsyncSession, task, timeout: float):
+        task_id = str(task.id)
+        error = f"Task exceeded its timeout of {timeout:.0f}s"
+        self.logger.error(f"Task {task_id} timed out after {timeout:.0f}s")
+        
+        # 超时取消不会停止沙箱容器，需要显式清理
+        try:
+            await self.execution_guard.docker_sandbox.cleanup_container(task_id)
+        except Exception as cleanup_error:
+            self.logger.warning(f"Container cleanup failed for timed out task {task_id}: {cleanup_error}")
+        
+        await self._on_failure(task_id, error)
+        
+        await db.execute(
+            update(Task)
+            .where(Task.id == task.id)
+            .values(
+                status="TIMED_OUT",
+                result={"error": error},
+                updated_at=func.now()
+            )
+        )
+        await db.commit()
+        await self.status_cache.set_status(task_id, "TIMED_OUT")
+        self.logger.log_task_transition(task_id, "RUNNING", "TIMED_OUT")
+
+    async def _handle_failure(self, db: AsyncSession, task, e: Exception):
+        task_id = str(task.id)
+        self.logger.error(f"Task {task_id} execution failed: {e}")
+        
+        await self._on_failure(task_id, str(e))
+        
+        retry_count = (task.retry_count or 0) + 1
+        if retry_count < settings.max_retry_count:
+            await db.execute(
+                update(Task)
+                .where(Task.id == task.id)
+                .values(
+                    status="QUEUED",
+                    retry_count=retry_count,
+                    updated_at=func.now()
+                )
+            )
+            self.logger.log_task_transition(task_id, "RUNNING", "QUEUED")
+            self.logger.info(f"Task {task_id} queued for retry ({retry_count}/{settings.max_retry_count})")
+        else:
+            await db.execute(
+                update(Task)
+                .where(Task.id == task.id)
+                .values(
+                    status="FAILED",
+                    result={"error": str(e)},
+                    updated_at=func.now()
+                )
+            )
+            self.logger.log_task_transition(task_id, "RUNNING", "FAILED")
+            self.logger.error(f"Task {task_id} failed after {settings.max_retry_count} retries")
+        
+        await db.commit()
+        
+        if retry_count < settings.max_retry_count:
+            await self.status_cache.set_status(task_id, "QUEUED", retry_count=retry_count)
+            await self._schedule_retry(task_id, retry_count, task.priority)
+        else:
+            await self.status_cache.set_status(task_id, "FAILED")
+
+    async def _schedule_retry(self, task_id: str, retry_count: int, priority: Optional[int]):
+        try:
+            await self.retry_scheduler.schedule(task_id, retry_count, priority or 5)
+        except Exception as e:
+            self.logger.error(f"Failed to schedule retry for task {task_id}: {e}")
+
+    async def _quarantine(self, stream: str, msg_id: str, fields: Dict[str, str], reason: str, detail: str = ""):
+        try:
+            await self.dead_letters.quarantine(stream, msg_id, fields, reason, detail)
+        except Exception as e:
+            logger.error(f"Failed to dead-letter message {msg_id}: {e}")
+
+    async def _quarantine_poison_task(self, stream: str, msg_id: str, fields: Dict[str, str], deliveries: int):
+        """A message delivered too often keeps crashing workers: stop retrying it."""
+        task_id = fields.get("task_id")
+        detail = f"delivered {deliveries} times (max {settings.max_delivery_count})"
+        await self._quarantine(stream, msg_id, fields, "max_deliveries_exceeded", detail)
+        
+        try:
+            task_uuid = uuid.UUID(task_id or "")
+        except ValueError:
+            return
+        try:
+            async for db in get_db():
+                result = await db.execute(
+                    update(Task)
+                    .where(Task.id == task_uuid, Task.status.in_(("QUEUED", "RUNNING")))
+                    .values(
+                        status="FAILED",
+                        result={"error": f"Task quarantined: {detail}"},
+                        updated_at=func.now()
                     )
-                    self.logger.log_task_transition(task_id, "RUNNING", "FAILED")
-                    self.logger.error(f"Task {task_id} failed after {settings.max_retry_count} retries")
-                
+                )
                 await db.commit()
+                if result.rowcount:
+                    await self.status_cache.set_status(task_id, "FAILED")
+        except Exception as e:
+            logger.error(f"Failed to mark quarantined task {task_id} as failed: {e}")
 
     async def handle_task_error(self, task_id: str, error: str):
         try:
@@ -246,22 +583,127 @@ class TaskConsumer:
                     )
                 )
                 await db.commit()
+                await self.status_cache.set_status(task_id, "FAILED")
         except Exception as e:
             logger.error(f"Failed to update task {task_id} error status: {e}")
 
-    async def ack_message(self, msg_id: str):
+    async def ack_message(self, msg_id: str, stream: Optional[str] = None):
         try:
             await self.redis_client.xack(
-                settings.redis_task_stream,
+                stream or settings.redis_task_stream,
                 settings.redis_consumer_group,
                 msg_id
             )
         except Exception as e:
             logger.error(f"Failed to acknowledge message {msg_id}: {e}")
 
-    async def stop(self):
+    def begin_drain(self):
+        """Stop reading new messages; in-flight tasks keep running."""
+        if self.running:
+            logger.info(f"Draining Task Consumer: {len(self._inflight)} tasks in flight")
         self.running = False
-        logger.info("Task Consumer stopped")
+
+    async def stop(self):
+        async with self._stop_lock:
+            if self._stopped:
+                return
+            
+            self.begin_drain()
+            if self._reclaim_task:
+                self._reclaim_task.cancel()
+                # 等回收循环把已接管但未启动的条目放回队列
+                await asyncio.gather(self._reclaim_task, return_exceptions=True)
+            if self._purge_task:
+                self._purge_task.cancel()
+            if self.retry_scheduler:
+                self.retry_scheduler.stop()
+            if self._retry_task:
+                self._retry_task.cancel()
+            
+            deadline = time.monotonic() + settings.shutdown_grace_period
+            try:
+                await asyncio.wait_for(self._consume_idle.wait(), timeout=settings.shutdown_grace_period)
+            except asyncio.TimeoutError:
+                logger.warning("Task consumption loop did not stop within the grace period")
+            
+            await self._drain(deadline)
+            if getattr(self, "memory_manager", None):
+                await self.memory_manager.close()
+            if self.agent_manager:
+                await self.agent_manager.close()
+            self._stopped = True
+            logger.info("Task Consumer stopped")
+
+    async def _drain(self, deadline: float):
+        """Wait for in-flight tasks until ``deadline`` (monotonic), then release the rest."""
+        if not self._inflight:
+            return
+        
+        # 完成的任务会从 _inflight 移除；循环等待直到为空，覆盖排空开始后才派发的任务
+        finished = 0
+        while self._inflight:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = await asyncio.wait(set(self._inflight), timeout=remaining)
+            finished += len(done)
+        
+        pending = set(self._inflight)
+        if not pending:
+            logger.info(f"All {finished} in-flight tasks finished during drain")
+            return
+        
+        unfinished = [self._inflight[task] for task in pending if task in self._inflight]
+        logger.warning(
+            f"{len(pending)} tasks still running after {settings.shutdown_grace_period}s "
+            f"grace period, releasing them to other workers"
+        )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+        for stream, msg_id, fields in unfinished:
+            await self._release_message(stream, msg_id, fields)
+
+    async def _release_message(
+        self,
+        stream: str,
+        msg_id: str,
+        fields: Dict[str, str],
+        reclaimed: bool = False
+    ):
+        """NACK an interrupted message: requeue the task and redeliver it immediately.
+        
+        Redis Streams has no negative acknowledgement, so the entry is re-added
+        to its stream and the original is acknowledged in the same transaction.
+        A reclaimed entry was never started here, so its task is only requeued
+        if the RUNNING row is stale, as in ``_claim_task``.
+        """
+        task_id = fields.get("task_id")
+        try:
+            if task_id:
+                releasable = Task.status == "RUNNING"
+                if reclaimed:
+                    stale_before = func.now() - timedelta(seconds=settings.pending_idle_timeout)
+                    releasable = and_(releasable, Task.updated_at < stale_before)
+                async for db in get_db():
+                    result = await db.execute(
+                        update(Task)
+                        .where(Task.id == uuid.UUID(task_id), releasable)
+                        .values(status="QUEUED", updated_at=func.now())
+                    )
+                    await db.commit()
+                    if result.rowcount:
+                        await self.status_cache.set_status(task_id, "QUEUED")
+            
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.xadd(stream, fields, maxlen=10000)
+                pipe.xack(stream, settings.redis_consumer_group, msg_id)
+                await pipe.execute()
+            
+            logger.info(f"Released task {task_id} (message {msg_id}) back to {stream}")
+        except Exception as e:
+            logger.error(f"Failed to release message {msg_id} for task {task_id}: {e}")
 
     async def _pre_process_task(self, task_id: str, prompt: str, config: Dict[str, Any]):
         """V0.6: Pre-process hook for task initialization"""
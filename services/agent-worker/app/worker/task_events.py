@@ -0,0 +1,42 @@
+import json
+from typing import Dict, Any
+
+from app.core.config import settings
+
+
+# 事件先写入按任务划分的有界流（供断线重连后重放），再带上流 ID 实时发布
+PUBLISH_EVENT_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], '*', 'event', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', KEYS[2], id .. ' ' .. ARGV[1])
+return id
+"""
+
+
+def task_event_channel(task_id: str) -> str:
+    return f"{settings.task_events_channel_prefix}:{task_id}"
+
+
+def task_event_stream(task_id: str) -> str:
+    return f"{settings.task_events_channel_prefix}:{task_id}:stream"
+
+
+class TaskEventPublisher:
+    """Publishes task events to a per-task Redis channel.
+
+    Every api-gateway replica subscribes to the channel pattern and forwards
+    the events to its own WebSocket connections. Each event is also appended
+    to a capped per-task stream so reconnecting clients can replay what they
+    missed; the stream entry ID is the event ID.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self._publish = redis_client.register_script(PUBLISH_EVENT_SCRIPT)
+
+    async def publish(self, task_id: str, event_type: str, payload: Dict[str, Any]) -> str:
+        event = json.dumps({"type": event_type, "payload": payload}, ensure_ascii=False, default=str)
+        return await self._publish(
+            keys=[task_event_stream(task_id), task_event_channel(task_id)],
+            args=[event, settings.task_events_stream_maxlen, settings.task_events_stream_ttl]
+        )
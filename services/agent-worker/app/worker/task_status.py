@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from typing import Any
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 写入状态字段并递增版本号，再发布变更信号供网关唤醒长轮询
+WRITE_STATUS_SCRIPT = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[2], version)
+return version
+"""
+
+
+def task_status_key(task_id: str) -> str:
+    return f"{settings.task_status_key_prefix}:{task_id}"
+
+
+def task_status_channel(task_id: str) -> str:
+    return f"{settings.task_status_key_prefix}:changed:{task_id}"
+
+
+class TaskStatusCache:
+    """Writes the small per-task status document the gateway serves polls from.
+
+    The document is a Redis hash: ``status``, ``updated_at``, ``user_id``,
+    ``retry_count`` and one ``step:<step_id>`` field per plan step. It is
+    written after the database commit, so it is never ahead of Postgres.
+    Every write bumps ``version`` and publishes it on the task's change
+    channel. A failed write is logged and the document dropped, so the
+    gateway falls back to the DB instead of serving a stale status.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self._write_status = redis_client.register_script(WRITE_STATUS_SCRIPT)
+
+    async def set_status(self, task_id: str, status: str, **fields: Any):
+        mapping = {
+            "status": status,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            **{name: str(value) for name, value in fields.items() if value is not None}
+        }
+        await self._write(task_id, mapping)
+
+    async def set_step(self, task_id: str, step_id: Any, step_status: str):
+        await self._write(task_id, {
+            f"step:{step_id}": step_status,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+
+    async def _write(self, task_id: str, mapping: dict):
+        args = [settings.task_status_ttl]
+        for field, value in mapping.items():
+            args.extend((field, value))
+        try:
+            await self._write_status(
+                keys=[task_status_key(task_id), task_status_channel(task_id)],
+                args=args
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update status cache for task {task_id}: {e}")
+            # 丢弃可能已过时的文档，网关回退到数据库
+            try:
+                await self.redis_client.delete(task_status_key(task_id))
+            except Exception:
+                pass
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+
+from app.core.deadline import deadline_scope, remaining, remaining_timeout
+
+
+def test_no_deadline_keeps_default_timeout():
+    assert remaining() is None
+    assert remaining_timeout(30) == 30
+
+
+def test_timeout_is_trimmed_to_remaining_budget():
+    with deadline_scope(5):
+        assert 4 < remaining() <= 5
+        assert remaining_timeout(30) <= 5
+        assert remaining_timeout(1) == 1
+
+    assert remaining() is None
+
+
+def test_nested_scope_cannot_extend_deadline():
+    with deadline_scope(2) as outer:
+        with deadline_scope(60) as inner:
+            assert inner == outer
+            assert remaining_timeout(30) <= 2
+        with deadline_scope(1) as shorter:
+            assert shorter < outer
+
+
+def test_expired_deadline_uses_floor():
+    with deadline_scope(0):
+        assert remaining() == 0.0
+        assert remaining_timeout(30) == 0.1
+        assert remaining_timeout(30, floor=0.5) == 0.5
+
+
+@pytest.mark.asyncio
+async def test_deadline_reaches_worker_threads():
+    with deadline_scope(5):
+        left = await asyncio.to_thread(remaining)
+    assert left is not None and left <= 5
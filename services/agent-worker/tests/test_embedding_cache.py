@@ -0,0 +1,118 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.core.config import settings
+from app.memory.embedding_cache import EmbeddingCache
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis.data.update(self.commands)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class BrokenRedis:
+    async def mget(self, keys):
+        raise ConnectionError("redis down")
+
+    def pipeline(self, transaction=True):
+        raise ConnectionError("redis down")
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_cache_size", 100)
+    monkeypatch.setattr(settings, "embedding_cache_snapshot_max_entries", 100)
+    return tmp_path / "embeddings.npy"
+
+
+@pytest.mark.asyncio
+async def test_lookups_fall_through_memory_and_redis(snapshot_path):
+    redis_client = FakeRedis()
+    cache = EmbeddingCache(redis_client, "model-a", str(snapshot_path))
+
+    assert await cache.get_many(["hello"]) == [None]
+    await cache.put_many(["hello"], [[0.5, 0.25]])
+    assert await cache.get_many(["hello"]) == [[0.5, 0.25]]
+
+    # 另一个 worker 只能从 Redis 读到（以 float16 存储）
+    other = EmbeddingCache(redis_client, "model-a", str(snapshot_path))
+    assert await other.get_many(["hello", "unknown"]) == [[0.5, 0.25], None]
+    assert await other.get_many(["hello"]) == [[0.5, 0.25]]
+
+    assert cache.stats == {"memory": 1, "snapshot": 0, "redis": 0, "miss": 1}
+    assert other.stats == {"memory": 1, "snapshot": 0, "redis": 1, "miss": 1}
+
+
+@pytest.mark.asyncio
+async def test_keys_include_the_model_name(snapshot_path):
+    redis_client = FakeRedis()
+    await EmbeddingCache(redis_client, "model-a", str(snapshot_path)).put_many(["hello"], [[1.0]])
+
+    assert await EmbeddingCache(redis_client, "model-b", str(snapshot_path)).get_many(["hello"]) == [None]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_survives_restart_without_redis(snapshot_path):
+    cache = EmbeddingCache(None, "model-a", str(snapshot_path))
+    await cache.put_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    await cache.save_snapshot()
+
+    restarted = EmbeddingCache(None, "model-a", str(snapshot_path))
+
+    assert await restarted.get_many(["b", "a", "c"]) == [[3.0, 4.0], [1.0, 2.0], None]
+    assert restarted.stats["snapshot"] == 2
+
+
+@pytest.mark.asyncio
+async def test_saving_keeps_entries_of_the_previous_snapshot(snapshot_path):
+    first = EmbeddingCache(None, "model-a", str(snapshot_path))
+    await first.put_many(["old"], [[1.0]])
+    await first.save_snapshot()
+
+    second = EmbeddingCache(None, "model-a", str(snapshot_path))
+    await second.put_many(["new"], [[2.0]])
+    await second.save_snapshot()
+
+    third = EmbeddingCache(None, "model-a", str(snapshot_path))
+    assert await third.get_many(["old", "new"]) == [[1.0], [2.0]]
+
+
+@pytest.mark.asyncio
+async def test_redis_failures_only_cost_a_miss(snapshot_path):
+    cache = EmbeddingCache(BrokenRedis(), "model-a", str(snapshot_path))
+
+    await cache.put_many(["a"], [[1.0]])
+    assert await cache.get_many(["a", "b"]) == [[1.0], None]
+
+
+def test_unreadable_snapshot_is_ignored(snapshot_path):
+    snapshot_path.write_bytes(b"not a numpy file")
+
+    cache = EmbeddingCache(None, "model-a", str(snapshot_path))
+
+    assert cache._snapshot_index == {}
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import pytest
+
+from app.memory.embedding_service import EmbeddingService
+
+
+class Vectors(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def encode(self, texts, batch_size):
+        with self.lock:
+            self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return Vectors([float(len(text))] for text in texts)
+
+
+class FakeCache:
+    def __init__(self, known):
+        self.known = dict(known)
+        self.stored = {}
+
+    async def get_many(self, texts):
+        return [self.known.get(text) for text in texts]
+
+    async def put_many(self, texts, vectors):
+        self.stored.update(zip(texts, vectors))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_encodes_share_one_batch():
+    model = FakeModel()
+    service = EmbeddingService(model, max_batch_size=32, max_wait_ms=20)
+    try:
+        vectors = await asyncio.gather(*(service.encode(text) for text in ["a", "bb", "ccc"]))
+    finally:
+        service.close()
+
+    assert vectors == [[1.0], [2.0], [3.0]]
+    assert model.batches == [["a", "bb", "ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting():
+    model = FakeModel()
+    service = EmbeddingService(model, max_batch_size=2, max_wait_ms=10_000)
+    try:
+        vectors = await asyncio.wait_for(service.encode_many(["a", "bb", "ccc", "dddd"]), timeout=1)
+    finally:
+        service.close()
+
+    assert vectors == [[1.0], [2.0], [3.0], [4.0]]
+    assert sorted(model.batches) == [["a", "bb"], ["ccc", "dddd"]]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_texts_are_encoded_once():
+    model = FakeModel()
+    service = EmbeddingService(model, max_batch_size=32, max_wait_ms=5)
+    try:
+        vectors = await asyncio.gather(service.encode("same"), service.encode("same"), service.encode("other"))
+    finally:
+        service.close()
+
+    assert vectors == [[4.0], [4.0], [5.0]]
+    assert model.batches == [["same", "other"]]
+
+
+@pytest.mark.asyncio
+async def test_model_error_reaches_every_caller():
+    service = EmbeddingService(FakeModel(fail=True), max_batch_size=32, max_wait_ms=5)
+    try:
+        results = await asyncio.gather(service.encode("a"), service.encode("b"), return_exceptions=True)
+    finally:
+        service.close()
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_only_cache_misses_reach_the_model():
+    model = FakeModel()
+    cache = FakeCache({"cached": [9.0]})
+    service = EmbeddingService(model, max_batch_size=32, max_wait_ms=5, cache=cache)
+    try:
+        vectors = await service.encode_many(["cached", "new", "new"])
+    finally:
+        service.close()
+
+    assert vectors == [[9.0], [3.0], [3.0]]
+    assert model.batches == [["new"]]
+    assert cache.stored == {"new": [3.0]}
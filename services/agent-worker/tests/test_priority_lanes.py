@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+
+from app.worker.priority_lanes import PriorityLaneScheduler
+
+
+WEIGHTS = {"high": 6, "normal": 3, "low": 1}
+
+
+def allocated(plan):
+    counts = Counter()
+    for lane, count in plan:
+        counts[lane] += count
+    return counts
+
+
+def test_plan_splits_slots_by_weight():
+    scheduler = PriorityLaneScheduler(WEIGHTS, starvation_timeout=3600)
+
+    counts = allocated(scheduler.plan(10))
+
+    assert counts == {"high": 6, "normal": 3, "low": 1}
+
+
+def test_plan_is_proportional_across_small_cycles():
+    scheduler = PriorityLaneScheduler(WEIGHTS, starvation_timeout=3600)
+
+    counts = Counter()
+    for _ in range(100):
+        counts += allocated(scheduler.plan(1))
+
+    assert counts == {"high": 60, "normal": 30, "low": 10}
+
+
+def test_plan_without_free_slots_is_empty():
+    scheduler = PriorityLaneScheduler(WEIGHTS, starvation_timeout=3600)
+
+    assert scheduler.plan(0) == []
+
+
+def test_starved_lane_is_read_first():
+    scheduler = PriorityLaneScheduler(WEIGHTS, starvation_timeout=30)
+    scheduler._last_polled["low"] = time.monotonic() - 60
+
+    plan = scheduler.plan(4)
+
+    assert plan[0] == ("low", 1)
+    assert sum(count for _, count in plan) == 4
+
+
+def test_starvation_guard_covers_zero_weight_lanes():
+    scheduler = PriorityLaneScheduler({"high": 1, "normal": 1, "low": 0}, starvation_timeout=30)
+
+    assert "low" not in allocated(scheduler.plan(5))
+
+    scheduler._last_polled["low"] = time.monotonic() - 60
+    assert allocated(scheduler.plan(5))["low"] == 1
+
+
+def test_mark_polled_clears_starvation():
+    scheduler = PriorityLaneScheduler(WEIGHTS, starvation_timeout=30)
+    scheduler._last_polled["low"] = time.monotonic() - 60
+
+    scheduler.mark_polled("low")
+
+    assert scheduler.plan(1) == [("high", 1)]
+
+
+def test_all_zero_weights_only_serve_starved_lanes():
+    scheduler = PriorityLaneScheduler({"high": 0, "normal": 0, "low": 0}, starvation_timeout=3600)
+
+    assert scheduler.plan(3) == []
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+import pytest
+
+from app.core import result_store
+from app.core.config import settings
+from app.core.result_store import ResultStore
+
+
+def decompress(codec: str, blob: bytes) -> bytes:
+    if codec == "zstd":
+        return result_store.zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "result_inline_max_bytes", 1024)
+    monkeypatch.setattr(settings, "result_summary_field_max_bytes", 64)
+    return ResultStore(str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_small_result_stays_inline(store, tmp_path):
+    result = {"status": "success", "summary": "done"}
+
+    assert await store.offload("a1b2", result) == result
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_large_result_is_offloaded_with_manifest(store, tmp_path):
+    result = {"status": "success", "conversation": [{"content": "x" * 100}] * 50}
+    raw = json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+    summary = await store.offload("a1b2c3", result)
+
+    manifest = summary["result_ref"]
+    assert summary["status"] == "success"
+    assert "conversation" not in summary
+    assert manifest["omitted_fields"] == ["conversation"]
+    assert manifest["key"] == f"a1/a1b2c3.json.{manifest['codec']}"
+    assert manifest["size"] == len(raw)
+    assert manifest["sha256"] == hashlib.sha256(raw).hexdigest()
+
+    blob = (tmp_path / manifest["key"]).read_bytes()
+    assert manifest["stored_size"] == len(blob) < len(raw)
+    assert json.loads(decompress(manifest["codec"], blob)) == result
+
+
+@pytest.mark.asyncio
+async def test_zlib_is_used_without_zstandard(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, "zstandard", None)
+
+    summary = await store.offload("ffee", {"payload": "y" * 4096})
+
+    manifest = summary["result_ref"]
+    assert manifest["codec"] == "zlib"
+    assert zlib.decompress((tmp_path / manifest["key"]).read_bytes()) == json.dumps({"payload": "y" * 4096}).encode()
+
+
+@pytest.mark.asyncio
+async def test_purge_expired_removes_old_blobs(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "result_store_retention_days", 30)
+    old = tmp_path / "aa" / "aa11.json.zlib"
+    fresh = tmp_path / "bb" / "bb22.json.zlib"
+    for path in (old, fresh):
+        path.parent.mkdir()
+        path.write_bytes(b"blob")
+    expired = time.time() - 31 * 86400
+    os.utime(old, (expired, expired))
+
+    assert await store.purge_expired() == 1
+    assert not old.exists()
+    assert fresh.exists()
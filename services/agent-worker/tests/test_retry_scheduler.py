@@ -0,0 +1,34 @@
+import pytest
+
+from app.core.config import settings
+from app.worker.retry_scheduler import RetryScheduler
+
+
+class FakeRedis:
+    def register_script(self, script):
+        return None
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "retry_backoff_base", 5.0)
+    monkeypatch.setattr(settings, "retry_backoff_max", 300.0)
+    return RetryScheduler(FakeRedis())
+
+
+@pytest.mark.parametrize("retry_count, ceiling", [(1, 5.0), (2, 10.0), (3, 20.0), (6, 160.0)])
+def test_backoff_delay_uses_equal_jitter(scheduler, retry_count, ceiling):
+    delays = [scheduler.backoff_delay(retry_count) for _ in range(200)]
+
+    assert all(ceiling / 2 <= delay <= ceiling for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_backoff_delay_is_capped(scheduler):
+    delays = [scheduler.backoff_delay(20) for _ in range(200)]
+
+    assert all(150.0 <= delay <= 300.0 for delay in delays)
+
+
+def test_backoff_delay_treats_first_attempt_as_retry_one(scheduler):
+    assert all(2.5 <= scheduler.backoff_delay(0) <= 5.0 for _ in range(50))
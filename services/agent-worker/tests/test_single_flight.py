@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+
+from app.core.config import settings
+from app.memory.single_flight import SingleFlight
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.queue in self.redis.subscribers:
+            self.redis.subscribers.remove(self.queue)
+
+    async def psubscribe(self, pattern):
+        self.redis.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.subscribers = []
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def publish(self, channel, data):
+        for queue in self.subscribers:
+            queue.put_nowait({"type": "pmessage", "channel": channel.encode(), "data": data})
+        return len(self.subscribers)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    def register_script(self, script):
+        async def release(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                del self.data[keys[0]]
+                return 1
+            return 0
+        return release
+
+
+class Counter:
+    def __init__(self, value="context", delay=0.01):
+        self.calls = 0
+        self.value = value
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+@pytest.fixture
+def short_wait(monkeypatch):
+    monkeypatch.setattr(settings, "single_flight_wait_timeout", 0.05)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_in_one_process_share_one_computation():
+    redis = FakeRedis()
+    flight = SingleFlight(redis)
+    compute = Counter()
+
+    results = await asyncio.gather(*(flight.do("k", compute) for _ in range(5)))
+
+    assert results == ["context"] * 5
+    assert compute.calls == 1
+    assert redis.data == {}
+    await flight.close()
+
+
+@pytest.mark.asyncio
+async def test_works_without_redis():
+    flight = SingleFlight(None)
+    compute = Counter()
+
+    results = await asyncio.gather(flight.do("k", compute), flight.do("k", compute))
+
+    assert results == ["context", "context"]
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_a_follower():
+    flight = SingleFlight(FakeRedis())
+    compute = Counter(delay=0.05)
+
+    leader = asyncio.create_task(flight.do("k", compute))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do("k", compute)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+    results = await asyncio.gather(*followers)
+
+    assert leader.cancelled()
+    assert results == ["context"] * 3
+    # 被取消的领导者一次，接手的跟随者一次
+    assert compute.calls == 2
+    await flight.close()
+
+
+@pytest.mark.asyncio
+async def test_follower_reads_result_through_lookup(short_wait):
+    redis = FakeRedis()
+    redis.data["mandas:singleflight:lock:k"] = "other-worker"
+    flight = SingleFlight(redis)
+    compute = Counter()
+
+    async def lookup():
+        return "stored"
+
+    assert await flight.do("k", compute, lookup=lookup) == "stored"
+    assert compute.calls == 0
+    await flight.close()
+
+
+@pytest.mark.asyncio
+async def test_follower_receives_result_published_by_other_worker(monkeypatch):
+    monkeypatch.setattr(settings, "single_flight_wait_timeout", 1.0)
+    redis = FakeRedis()
+    redis.data["mandas:singleflight:lock:k"] = "other-worker"
+    flight = SingleFlight(redis)
+    compute = Counter()
+
+    follower = asyncio.create_task(flight.do("k", compute))
+    while not redis.subscribers or not flight._remote_waiters:
+        await asyncio.sleep(0.001)
+    await redis.publish("mandas:singleflight:done:k", '"remote"')
+
+    assert await follower == "remote"
+    assert compute.calls == 0
+    await flight.close()
+
+
+@pytest.mark.asyncio
+async def test_follower_computes_itself_when_leader_is_silent(short_wait):
+    redis = FakeRedis()
+    redis.data["mandas:singleflight:lock:k"] = "other-worker"
+    flight = SingleFlight(redis)
+    compute = Counter()
+
+    async def lookup():
+        return None
+
+    assert await flight.do("k", compute, lookup=lookup) == "context"
+    assert compute.calls == 1
+    await flight.close()
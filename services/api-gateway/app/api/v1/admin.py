@@ -0,0 +1,141 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
+from sqlalchemy.sql import func
+import redis.asyncio as redis
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.database import get_db, Task
+from app.core.redis_client import get_redis, stream_for_priority
+from app.core.auth import require_admin
+from app.core.task_status import set_task_status
+from loguru import logger
+
+router = APIRouter()
+
+# agent-worker 隔离消息时附加的字段，重放前移除
+DEAD_LETTER_FIELDS = ("dlq_reason", "dlq_detail", "source_stream", "source_id", "failed_at", "consumer")
+
+
+def _format_entry(entry_id: str, fields: dict) -> dict:
+    return {
+        "id": entry_id,
+        "reason": fields.get("dlq_reason"),
+        "detail": fields.get("dlq_detail"),
+        "source_stream": fields.get("source_stream"),
+        "source_id": fields.get("source_id"),
+        "failed_at": fields.get("failed_at"),
+        "consumer": fields.get("consumer"),
+        "message": {k: v for k, v in fields.items() if k not in DEAD_LETTER_FIELDS}
+    }
+
+
+async def _get_entry(redis_client: redis.Redis, entry_id: str) -> dict:
+    entries = await redis_client.xrange(settings.redis_dead_letter_stream, min=entry_id, max=entry_id)
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dead-letter entry not found"
+        )
+    return entries[0][1]
+
+
+@router.get("/dead-letters")
+async def list_dead_letters(
+    count: int = 50,
+    before: str = "+",
+    current_user: dict = Depends(require_admin),
+    redis_client: redis.Redis = Depends(get_redis)
+):
+    """List dead-lettered messages, newest first; page with ``before`` = last id."""
+    count = max(1, min(count, 500))
+    max_id = before if before == "+" else f"({before}"
+    entries = await redis_client.xrevrange(
+        settings.redis_dead_letter_stream, max=max_id, min="-", count=count
+    )
+    total = await redis_client.xlen(settings.redis_dead_letter_stream)
+
+    return {
+        "total": total,
+        "items": [_format_entry(entry_id, fields) for entry_id, fields in entries],
+        "next_before": entries[-1][0] if len(entries) == count else None
+    }
+
+
+@router.get("/dead-letters/{entry_id}")
+async def get_dead_letter(
+    entry_id: str,
+    current_user: dict = Depends(require_admin),
+    redis_client: redis.Redis = Depends(get_redis)
+):
+    fields = await _get_entry(redis_client, entry_id)
+    return _format_entry(entry_id, fields)
+
+
+@router.post("/dead-letters/{entry_id}/replay")
+async def replay_dead_letter(
+    entry_id: str,
+    current_user: dict = Depends(require_admin),
+    redis_client: redis.Redis = Depends(get_redis),
+    db: AsyncSession = Depends(get_db)
+):
+    """Put the original message back on its stream and remove it from the dead letters."""
+    fields = await _get_entry(redis_client, entry_id)
+    message = {k: v for k, v in fields.items() if k not in DEAD_LETTER_FIELDS}
+    message["timestamp"] = str(int(time.time()))
+
+    try:
+        priority = int(message.get("priority", 5))
+    except ValueError:
+        priority = 5
+    target_stream = fields.get("source_stream") or stream_for_priority(priority)
+
+    task_id = message.get("task_id")
+    try:
+        task_uuid = uuid.UUID(task_id or "")
+    except ValueError:
+        task_uuid = None
+
+    if task_uuid:
+        # worker 只认领 QUEUED 状态的任务
+        reset = await db.execute(
+            update(Task)
+            .where(Task.id == task_uuid, Task.status.in_(("FAILED", "TIMED_OUT", "RUNNING")))
+            .values(status="QUEUED", updated_at=func.now())
+        )
+        await db.commit()
+        if reset.rowcount:
+            await set_task_status(str(task_uuid), "QUEUED")
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xadd(target_stream, message, maxlen=10000)
+        pipe.xdel(settings.redis_dead_letter_stream, entry_id)
+        results = await pipe.execute()
+
+    logger.info(f"Dead-letter entry {entry_id} replayed to {target_stream} by {current_user['username']}")
+
+    return {
+        "id": entry_id,
+        "replayed_to": target_stream,
+        "new_message_id": results[0],
+        "task_id": task_id
+    }
+
+
+@router.delete("/dead-letters/{entry_id}")
+async def delete_dead_letter(
+    entry_id: str,
+    current_user: dict = Depends(require_admin),
+    redis_client: redis.Redis = Depends(get_redis)
+):
+    deleted = await redis_client.xdel(settings.redis_dead_letter_stream, entry_id)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dead-letter entry not found"
+        )
+
+    logger.info(f"Dead-letter entry {entry_id} discarded by {current_user['username']}")
+    return {"message": "Dead-letter entry deleted"}
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import redis.asyncio as redis
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import uuid
 import os
 import aiofiles
@@ -11,6 +12,8 @@ from datetime import datetime
 from app.core.database import get_db, KnowledgeBaseDocs
 from app.core.config import settings
 from app.core.auth import get_current_user
+from app.core.redis_client import get_redis
+from app.core.pagination import keyset_page, encode_cursor, cached_count
 from loguru import logger
 
 router = APIRouter()
@@ -88,15 +91,45 @@ async def upload_document(
 
 @router.get("/", response_model=List[DocumentResponse])
 async def list_documents(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_client: redis.Redis = Depends(get_redis)
 ):
-    result = await db.execute(
-        select(KnowledgeBaseDocs).where(
-            KnowledgeBaseDocs.user_id == uuid.UUID(current_user["sub"])
-        ).order_by(KnowledgeBaseDocs.created_at.desc())
-    )
-    documents = result.scalars().all()
+    """List documents newest first.
+
+    Without ``limit`` or ``cursor`` every document is returned, as before.
+    Paged requests keep the plain array body; the next page's cursor is
+    returned in the ``X-Next-Cursor`` header and the cached total in
+    ``X-Total-Count``.
+    """
+    paged = limit is not None or cursor is not None
+    limit = max(1, min(limit or 100, 500))
+    user_id = uuid.UUID(current_user["sub"])
+    
+    query = select(
+        KnowledgeBaseDocs.id, KnowledgeBaseDocs.file_name, KnowledgeBaseDocs.file_size,
+        KnowledgeBaseDocs.mime_type, KnowledgeBaseDocs.status, KnowledgeBaseDocs.created_at
+    ).where(KnowledgeBaseDocs.user_id == user_id)
+    if paged:
+        query = keyset_page(query, KnowledgeBaseDocs.created_at, KnowledgeBaseDocs.id, cursor, limit)
+    else:
+        query = query.order_by(KnowledgeBaseDocs.created_at.desc(), KnowledgeBaseDocs.id.desc())
+    
+    documents = (await db.execute(query)).all()
+    if paged and len(documents) > limit:
+        documents = documents[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1].created_at, documents[-1].id)
+    
+    if include_total:
+        total = await cached_count(
+            db, redis_client, f"mandas:document-count:{user_id}",
+            select(KnowledgeBaseDocs.id).where(KnowledgeBaseDocs.user_id == user_id)
+        )
+        response.headers["X-Total-Count"] = str(total)
     
     return [
         {
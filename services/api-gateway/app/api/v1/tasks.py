@@ -1,52 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, insert, func
+import redis.asyncio as redis
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, Set
+from typing import Optional, List, Dict, Any
+import asyncio
+import hashlib
+import json
 import uuid
 from datetime import datetime
 
-from app.core.database import get_db, Task
-from app.core.redis_client import publish_task_to_queue
-from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.database import get_db, Task, TaskOutbox
+from app.core.redis_client import publish_task_to_queue, get_redis
+from app.core.outbox import outbox_relay
+from app.core.task_dedup import (
+    claim_idempotency_key, confirm_idempotency_key, release_idempotency_key,
+    parse_idempotency_value, find_memoized_task
+)
+from app.core.pagination import keyset_page, encode_cursor, cached_count
+from app.core.event_bus import publish_task_event, event_id_key
+from app.core.websocket_manager import manager, MultiplexConnection
+from app.core.result_store import CONTENT_ENCODINGS, ResultBlobMissing, blob_path, stream_result
+from app.core.auth import get_current_user, verify_token
+from app.core.task_status import get_status_doc, fill_status_doc, set_task_status, set_step_status, status_watcher
 from loguru import logger
 
 router = APIRouter()
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, task_id: str):
-        await websocket.accept()
-        if task_id not in self.active_connections:
-            self.active_connections[task_id] = set()
-        self.active_connections[task_id].add(websocket)
-    
-    def disconnect(self, websocket: WebSocket, task_id: str):
-        if task_id in self.active_connections:
-            self.active_connections[task_id].discard(websocket)
-    
-    async def broadcast_to_task(self, task_id: str, message: dict):
-        if task_id in self.active_connections:
-            disconnected = set()
-            for connection in self.active_connections[task_id]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    disconnected.add(connection)
-            
-            for conn in disconnected:
-                self.active_connections[task_id].discard(conn)
-
-manager = ConnectionManager()
-
 
 class TaskCreate(BaseModel):
     prompt: str
     config: Optional[Dict[str, Any]] = {}
 
 
+class TaskBatchCreate(BaseModel):
+    tasks: List[TaskCreate]
+
+
 class TaskResponse(BaseModel):
     id: str
     user_id: str
@@ -65,33 +57,148 @@ class TaskListResponse(BaseModel):
     items: List[TaskResponse]
 
 
+# fields= 可选的列；JSONB 列在模型上延迟加载，只有被请求时才会查询
+TASK_FIELDS = {
+    "id": Task.id,
+    "user_id": Task.user_id,
+    "status": Task.status,
+    "prompt": Task.prompt,
+    "plan": Task.plan,
+    "step_status": Task.plan.label("step_status"),
+    "result": Task.result,
+    "config": Task.config,
+    "priority": Task.priority,
+    "retry_count": Task.retry_count,
+    "created_at": Task.created_at,
+    "updated_at": Task.updated_at
+}
+DEFAULT_TASK_FIELDS = ("id", "user_id", "status", "prompt", "plan", "result", "created_at", "updated_at")
+DEFAULT_LIST_FIELDS = ("id", "user_id", "status", "prompt", "created_at", "updated_at")
+# 可由 Redis 状态文档直接返回的字段，轮询时用 fields= 只请求这些字段即可不访问数据库
+STATUS_FIELDS = ("id", "user_id", "status", "updated_at", "retry_count", "step_status")
+
+
+def _parse_fields(fields: Optional[str], default: tuple) -> List[str]:
+    if not fields:
+        return list(default)
+    
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in TASK_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(TASK_FIELDS)}"
+        )
+    return names
+
+
+def _serialize_field(name: str, value: Any) -> Any:
+    if name == "plan":
+        return value.get("steps", []) if value else []
+    if name == "step_status":
+        steps = value.get("steps", []) if value else []
+        return {str(step.get("step_id")): step.get("status") for step in steps}
+    if value is None:
+        return None
+    if name in ("id", "user_id"):
+        return str(value)
+    if name in ("created_at", "updated_at"):
+        return value.isoformat()
+    return value
+
+
 @router.post("/", status_code=status.HTTP_202_ACCEPTED)
 async def create_task(
     task_data: TaskCreate,
+    reuse_result: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_client: redis.Redis = Depends(get_redis)
 ):
+    """Create and queue a task.
+
+    Repeating a request with the same ``Idempotency-Key`` returns the task
+    created by the first one, or 409 while the first one is still being
+    committed. With ``reuse_result=true`` an identical
+    prompt and config that completed within the worker's
+    ``TASK_MEMO_WINDOW`` returns that task's result instead of running it
+    again.
+    """
+    user_id = current_user["sub"]
+    
+    if reuse_result:
+        memoized = await find_memoized_task(db, redis_client, user_id, task_data.prompt, task_data.config)
+        if memoized:
+            logger.info(f"Reusing result of task {memoized.id} for user {current_user['username']}")
+            return {
+                "task_id": str(memoized.id),
+                "status": memoized.status,
+                "message": "相同任务已在近期完成，直接返回已有结果。",
+                "created_at": memoized.created_at.isoformat(),
+                "result": memoized.result,
+                "reused": True
+            }
+    
     task_id = uuid.uuid4()
+    if idempotency_key:
+        if len(idempotency_key) > 255:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Idempotency-Key must be at most 255 characters"
+            )
+        existing_value = await claim_idempotency_key(redis_client, user_id, idempotency_key, str(task_id))
+        if existing_value:
+            existing_id, pending = parse_idempotency_value(existing_value)
+            existing = (await db.execute(
+                select(Task.status, Task.created_at).where(
+                    Task.id == uuid.UUID(existing_id),
+                    Task.user_id == uuid.UUID(user_id)
+                )
+            )).one_or_none()
+            if existing is not None:
+                return {
+                    "task_id": existing_id,
+                    "status": existing.status,
+                    "message": "重复提交，返回已有任务。",
+                    "created_at": existing.created_at.isoformat(),
+                    "duplicate": True
+                }
+            if pending:
+                # 首个请求尚未提交，不能返回一个可能永远不会存在的任务
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+            # 绑定的任务已不存在（例如已被删除），改为绑定到本次创建的任务
+            await claim_idempotency_key(redis_client, user_id, idempotency_key, str(task_id), replace=True)
+    
     priority = task_data.config.get("priority", 5)
     
     new_task = Task(
         id=task_id,
-        user_id=uuid.UUID(current_user["sub"]),
+        user_id=uuid.UUID(user_id),
         prompt=task_data.prompt,
         config=task_data.config,
         priority=priority
     )
     
-    db.add(new_task)
-    await db.commit()
-    await db.refresh(new_task)
-    
-    success = await publish_task_to_queue(str(task_id), priority)
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to queue task"
-        )
+    try:
+        db.add(new_task)
+        # 出队请求与任务同一事务提交，由 outbox 中继写入任务流
+        db.add(TaskOutbox(task_id=task_id, priority=priority))
+        await db.commit()
+    except BaseException:
+        # 包括客户端断开导致的 CancelledError
+        if idempotency_key:
+            await release_idempotency_key(redis_client, user_id, idempotency_key, str(task_id))
+        raise
+    outbox_relay.notify()
+    if idempotency_key:
+        await confirm_idempotency_key(redis_client, user_id, idempotency_key, str(task_id))
+    
+    await db.refresh(new_task, ["created_at"])
+    await set_task_status(str(task_id), "QUEUED", user_id=user_id, retry_count=0)
     
     logger.info(f"Task {task_id} created and queued for user {current_user['username']}")
     
@@ -103,12 +210,193 @@ async def create_task(
     }
 
 
+@router.post("/batch", status_code=status.HTTP_202_ACCEPTED)
+async def create_task_batch(
+    batch: TaskBatchCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Submit many tasks with one multi-row INSERT; the outbox relay enqueues them in batches."""
+    if not batch.tasks or len(batch.tasks) > settings.task_batch_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain 1 to {settings.task_batch_max_size} tasks"
+        )
+    
+    batch_id = uuid.uuid4()
+    user_id = uuid.UUID(current_user["sub"])
+    rows = []
+    for task_data in batch.tasks:
+        config = task_data.config or {}
+        rows.append({
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "status": "QUEUED",
+            "prompt": task_data.prompt,
+            "config": config,
+            "priority": config.get("priority", 5),
+            "retry_count": 0,
+            "batch_id": batch_id
+        })
+    
+    await db.execute(insert(Task).values(rows))
+    await db.execute(insert(TaskOutbox).values([
+        {"task_id": row["id"], "priority": row["priority"]} for row in rows
+    ]))
+    await db.commit()
+    outbox_relay.notify()
+    
+    logger.info(f"Batch {batch_id} of {len(rows)} tasks created and queued for user {current_user['username']}")
+    
+    return {
+        "batch_id": str(batch_id),
+        "status": "QUEUED",
+        "count": len(rows),
+        "task_ids": [str(row["id"]) for row in rows]
+    }
+
+
+@router.get("/batch/{batch_id}")
+async def get_task_batch(
+    batch_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Per-status task counts of a batch."""
+    try:
+        batch_uuid = uuid.UUID(batch_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid batch ID format"
+        )
+    
+    result = await db.execute(
+        select(Task.status, func.count())
+        .where(Task.batch_id == batch_uuid, Task.user_id == uuid.UUID(current_user["sub"]))
+        .group_by(Task.status)
+    )
+    counts = {task_status: count for task_status, count in result.all()}
+    
+    if not counts:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+    
+    total = sum(counts.values())
+    finished = sum(counts.get(name, 0) for name in ("COMPLETED", "FAILED", "TIMED_OUT"))
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "counts": counts,
+        "finished": finished,
+        "done": finished == total
+    }
+
+
+async def _load_task(task_uuid: uuid.UUID, names: List[str], current_user: dict, db: AsyncSession) -> Dict[str, Any]:
+    status_only = set(names) <= set(STATUS_FIELDS)
+    if status_only:
+        doc = await get_status_doc(str(task_uuid))
+        if doc and doc["user_id"] == current_user["sub"] and all(name in doc for name in names):
+            return {name: doc[name] for name in names}
+    
+    # 未命中缓存时一并读取全部状态字段，用于回填缓存
+    selected = list(STATUS_FIELDS) if status_only else names
+    result = await db.execute(
+        select(*(TASK_FIELDS[name] for name in selected)).where(
+            Task.id == task_uuid,
+            Task.user_id == uuid.UUID(current_user["sub"])
+        )
+    )
+    row = result.one_or_none()
+    
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    task = {name: _serialize_field(name, value) for name, value in zip(selected, row)}
+    if status_only:
+        await fill_status_doc(str(task_uuid), task)
+    return {name: task[name] for name in names}
+
+
+def _etag(body: Dict[str, Any]) -> str:
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
 @router.get("/{task_id}")
 async def get_task(
     task_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    wait: float = 0,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
+    """Get a task; ``fields=status,updated_at`` selects only those columns.
+
+    Requests limited to ``STATUS_FIELDS`` are served from the Redis status
+    document the worker keeps current, falling back to the database.
+    Responses carry an ETag: a matching ``If-None-Match`` gets 304, and with
+    ``wait=<seconds>`` the request is parked until the task changes first.
+    """
+    names = _parse_fields(fields, DEFAULT_TASK_FIELDS)
+    
+    try:
+        task_uuid = uuid.UUID(task_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid task ID format"
+        )
+    
+    wait = max(0.0, min(wait, settings.task_poll_max_wait))
+    if_none_match = request.headers.get("if-none-match")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    
+    # 先注册等待再读取，避免错过读取与挂起之间发生的变更
+    async with status_watcher.watch(str(task_uuid)) as changed:
+        body = await _load_task(task_uuid, names, current_user, db)
+        etag = _etag(body)
+        
+        while _etag_matches(if_none_match, etag) and deadline - loop.time() > 0:
+            # 挂起期间归还数据库连接
+            await db.rollback()
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            changed.clear()
+            body = await _load_task(task_uuid, names, current_user, db)
+            etag = _etag(body)
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+
+@router.get("/{task_id}/result")
+async def get_task_result(
+    task_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full task result; results offloaded by the worker are streamed from the result store."""
     try:
         task_uuid = uuid.UUID(task_id)
     except ValueError:
@@ -118,88 +406,215 @@ async def get_task(
         )
     
     result = await db.execute(
-        select(Task).where(
+        select(Task.result).where(
             Task.id == task_uuid,
             Task.user_id == uuid.UUID(current_user["sub"])
         )
     )
-    task = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not task:
+    if not row or row.result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
+            detail="Task result not found"
         )
     
-    plan_steps = []
-    if task.plan:
-        plan_steps = task.plan.get("steps", [])
+    manifest = row.result.get("result_ref")
+    if not manifest:
+        return row.result
     
-    return {
-        "id": str(task.id),
-        "user_id": str(task.user_id),
-        "status": task.status,
-        "prompt": task.prompt,
-        "plan": plan_steps,
-        "result": task.result,
-        "created_at": task.created_at.isoformat(),
-        "updated_at": task.updated_at.isoformat()
+    try:
+        blob_path(manifest)
+    except ResultBlobMissing:
+        # 超过 agent-worker 的 RESULT_STORE_RETENTION_DAYS 后结果文件会被删除
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Task result has expired"
+        )
+    except ValueError as e:
+        logger.error(f"Result blob for task {task_id} unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task result not found"
+        )
+    
+    # 客户端支持该压缩格式时直接透传，省去网关解压
+    content_encoding = CONTENT_ENCODINGS.get(manifest["codec"])
+    accepted = {
+        part.split(";")[0].strip()
+        for part in request.headers.get("accept-encoding", "").split(",")
     }
+    passthrough = content_encoding in accepted
+    
+    # 响应编码取决于 Accept-Encoding，共享缓存需按其区分
+    headers = {"X-Result-Sha256": manifest["sha256"], "Vary": "Accept-Encoding"}
+    if passthrough:
+        headers["Content-Encoding"] = content_encoding
+    
+    return StreamingResponse(
+        stream_result(manifest, decompress=not passthrough),
+        media_type="application/json",
+        headers=headers
+    )
 
 
 @router.get("/")
 async def list_tasks(
-    page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    page: int = 1,
     status_filter: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_client: redis.Redis = Depends(get_redis)
 ):
-    offset = (page - 1) * limit
-    
-    query = select(Task).where(Task.user_id == uuid.UUID(current_user["sub"]))
-    
-    if status_filter:
-        query = query.where(Task.status == status_filter)
-    
-    query = query.order_by(Task.created_at.desc()).offset(offset).limit(limit)
-    
-    result = await db.execute(query)
-    tasks = result.scalars().all()
-    
-    count_query = select(Task).where(Task.user_id == uuid.UUID(current_user["sub"]))
+    """List tasks newest first.
+
+    Pass ``next_cursor`` from the previous response as ``cursor`` to page;
+    ``page`` (OFFSET) is kept for older clients. ``total`` is a cached
+    COUNT(*) and can be skipped with ``include_total=false``. ``fields``
+    selects the columns of each item as on ``GET /tasks/{id}``.
+    """
+    names = _parse_fields(fields, DEFAULT_LIST_FIELDS)
+    limit = max(1, min(limit, 100))
+    user_id = uuid.UUID(current_user["sub"])
+    
+    conditions = [Task.user_id == user_id]
     if status_filter:
-        count_query = count_query.where(Task.status == status_filter)
+        conditions.append(Task.status == status_filter)
     
-    count_result = await db.execute(count_query)
-    total = len(count_result.scalars().all())
+    # 只取请求的列；id 与 created_at 始终查询，用于生成游标
+    columns = {
+        name: func.left(Task.prompt, 101).label("prompt") if name == "prompt" else TASK_FIELDS[name]
+        for name in names
+    }
+    columns.setdefault("id", Task.id)
+    columns.setdefault("created_at", Task.created_at)
+    query = select(*columns.values()).where(*conditions)
+    query = keyset_page(query, Task.created_at, Task.id, cursor, limit)
+    if not cursor and page > 1:
+        query = query.offset((page - 1) * limit)
+    
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    total = None
+    if include_total:
+        total = await cached_count(
+            db, redis_client, f"mandas:task-count:{user_id}:{status_filter or '*'}",
+            select(Task.id).where(*conditions)
+        )
     
     task_items = []
-    for task in tasks:
-        task_items.append({
-            "id": str(task.id),
-            "user_id": str(task.user_id),
-            "status": task.status,
-            "prompt": task.prompt[:100] + "..." if len(task.prompt) > 100 else task.prompt,
-            "created_at": task.created_at.isoformat(),
-            "updated_at": task.updated_at.isoformat()
-        })
+    for row in rows:
+        item = {name: _serialize_field(name, row._mapping[name]) for name in names}
+        if "prompt" in item and len(item["prompt"]) > 100:
+            item["prompt"] = item["prompt"][:100] + "..."
+        task_items.append(item)
     
     return {
         "total": total,
         "page": page,
         "limit": limit,
-        "items": task_items
+        "items": task_items,
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
     }
 
 
+async def _handle_subscription_message(connection: MultiplexConnection, message: Any):
+    if not isinstance(message, dict) or message.get("action") not in ("subscribe", "unsubscribe"):
+        await connection.send_now({"type": "error", "message": "Expected {\"action\": \"subscribe\" | \"unsubscribe\"}"})
+        return
+    
+    action = message["action"]
+    if message.get("scope") == "user":
+        if action == "subscribe":
+            manager.subscribe_user(connection)
+        else:
+            manager.unsubscribe_user(connection)
+        await connection.send_now({"type": f"{action}d", "scope": "user"})
+        return
+    
+    task_ids = message.get("task_ids") or []
+    if not isinstance(task_ids, list) or not all(isinstance(task_id, str) for task_id in task_ids):
+        await connection.send_now({"type": "error", "message": "\"task_ids\" must be a list of strings"})
+        return
+    if action == "subscribe":
+        subscribed, rejected = await manager.subscribe(connection, task_ids)
+        await connection.send_now({"type": "subscribed", "task_ids": subscribed, "rejected": rejected})
+    else:
+        manager.unsubscribe(connection, task_ids)
+        await connection.send_now({"type": "unsubscribed", "task_ids": task_ids})
+
+
+@router.websocket("/stream")
+async def websocket_multiplex_stream(websocket: WebSocket, token: str):
+    """Events of many tasks over one authenticated socket.
+
+    Send ``{"action": "subscribe", "task_ids": [...]}`` or
+    ``{"action": "subscribe", "scope": "user"}`` for every task of the
+    current user; ``unsubscribe`` takes the same forms. Events arrive as
+    ``{"type": "task_event", "task_id", "seq", "event"}``.
+    """
+    try:
+        payload = verify_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    
+    connection = await manager.connect_multiplex(websocket, payload["sub"])
+    try:
+        await connection.send_now({
+            "type": "connection_established",
+            "payload": {"message": "WebSocket connection established"}
+        })
+        
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except WebSocketDisconnect:
+                break
+            except ValueError:
+                await connection.send_now({"type": "error", "message": "Invalid JSON message"})
+                continue
+            await _handle_subscription_message(connection, message)
+            
+    except Exception as e:
+        logger.error(f"Multiplexed WebSocket error: {e}")
+    finally:
+        manager.disconnect_multiplex(connection)
+
+
 @router.websocket("/{task_id}/stream")
-async def websocket_task_stream(websocket: WebSocket, task_id: str):
+async def websocket_task_stream(
+    websocket: WebSocket,
+    task_id: str,
+    last_event_id: Optional[str] = None,
+    token: Optional[str] = None
+):
+    """Live task events; pass ``last_event_id`` ("0" for all) to replay missed ones first.
+
+    Replaying reads the task's stored history, so it requires ``token`` of
+    the task's owner.
+    """
+    connection = None
     try:
         task_uuid = uuid.UUID(task_id)
-        await manager.connect(websocket, task_id)
+        if last_event_id is not None:
+            event_id_key(last_event_id)
+            try:
+                payload = verify_token(token) if token else None
+            except HTTPException:
+                payload = None
+            if payload is None or await manager.task_owners.get(task_id) != payload.get("sub"):
+                await websocket.close(code=1008)
+                return
+        connection = await manager.connect(websocket, task_id, replaying=last_event_id is not None)
         
-        await websocket.send_json({
+        await connection.send_now({
             "type": "connection_established",
             "payload": {
                 "task_id": task_id,
@@ -207,6 +622,9 @@ async def websocket_task_stream(websocket: WebSocket, task_id: str):
             }
         })
         
+        if last_event_id is not None:
+            await manager.replay(connection, task_id, last_event_id)
+        
         while True:
             try:
                 await websocket.receive_text()
@@ -214,11 +632,14 @@ async def websocket_task_stream(websocket: WebSocket, task_id: str):
                 break
                 
     except ValueError:
-        await websocket.send_json({"error": "Invalid task ID format"})
+        await websocket.accept()
+        await websocket.send_json({"error": "Invalid task ID or event ID format"})
+        await websocket.close()
     except Exception as e:
         logger.error(f"WebSocket connection error: {e}")
     finally:
-        manager.disconnect(websocket, task_id)
+        if connection is not None:
+            manager.disconnect(connection, task_id)
 
 @router.get("/{task_id}/plan")
 async def get_task_plan(
@@ -237,12 +658,12 @@ async def get_task_plan(
         )
     
     result = await db.execute(
-        select(Task).where(
+        select(Task.plan).where(
             Task.id == task_uuid,
             Task.user_id == uuid.UUID(current_user["sub"])
         )
     )
-    task = result.scalar_one_or_none()
+    task = result.one_or_none()
     
     if not task:
         raise HTTPException(
@@ -287,12 +708,12 @@ async def regenerate_task_plan(
         )
     
     result = await db.execute(
-        select(Task).where(
+        select(Task.plan).where(
             Task.id == task_uuid,
             Task.user_id == uuid.UUID(current_user["sub"])
         )
     )
-    task = result.scalar_one_or_none()
+    task = result.one_or_none()
     
     if not task:
         raise HTTPException(
@@ -306,7 +727,7 @@ async def regenerate_task_plan(
     
     await publish_task_to_queue(f"regenerate_plan:{task_id}", 1)
     
-    await manager.broadcast_to_task(task_id, {
+    await publish_task_event(task_id, {
         "type": "plan_regeneration_started",
         "payload": {
             "task_id": task_id,
@@ -338,8 +759,8 @@ async def update_plan_step(
             detail="Invalid task ID format"
         )
     
-    result = await db.execute(select(Task).where(Task.id == task_uuid))
-    task = result.scalar_one_or_none()
+    result = await db.execute(select(Task.plan).where(Task.id == task_uuid))
+    task = result.one_or_none()
     
     if not task or not task.plan:
         raise HTTPException(
@@ -367,8 +788,10 @@ async def update_plan_step(
         .values(plan=plan)
     )
     await db.commit()
+    if step_data.get("status"):
+        await set_step_status(task_id, step_id, step_data["status"])
     
-    await manager.broadcast_to_task(task_id, {
+    await publish_task_event(task_id, {
         "type": "step_status_update",
         "payload": {
             "step_id": step_id,
@@ -390,7 +813,7 @@ async def broadcast_websocket_event(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        await manager.broadcast_to_task(task_id, event)
+        await publish_task_event(task_id, event)
         return {"status": "broadcasted"}
     except Exception as e:
         logger.error(f"Failed to broadcast event: {e}")
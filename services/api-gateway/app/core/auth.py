@@ -51,3 +51,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token = credentials.credentials
     payload = verify_token(token)
     return payload
+
+
+async def require_admin(current_user: dict = Depends(get_current_user)):
+    if current_user.get("username") not in settings.admin_usernames:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required"
+        )
+    return current_user
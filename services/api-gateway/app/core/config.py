@@ -18,6 +18,47 @@ class Settings(BaseSettings):
     redis_task_queue: str = "mandas:tasks:queue"
     redis_task_stream: str = "mandas:tasks:stream"
     
+    # 优先级通道：数值越小优先级越高，需与 agent-worker 配置保持一致
+    priority_high_max: int = 3
+    priority_low_min: int = 7
+    
+    redis_dead_letter_stream: str = "mandas:tasks:dead-letter"
+    
+    task_events_channel_prefix: str = "mandas:task-events"  # 需与 agent-worker 配置保持一致
+    task_events_stream_maxlen: int = 1000  # 每个任务保留用于重放的事件数
+    task_events_stream_ttl: int = 86400
+    
+    task_status_key_prefix: str = "mandas:task-status"  # 需与 agent-worker 配置保持一致
+    task_status_ttl: int = 300  # 秒，写入失败时缓存最多落后数据库这么久
+    task_poll_max_wait: float = 30.0  # 秒，GET /tasks/{id}?wait= 长轮询的最长挂起时间
+    
+    # WebSocket 每个连接的发送队列与背压策略
+    ws_send_queue_size: int = 256
+    ws_coalesce_interval_ms: int = 100  # 步骤状态更新合并发送的间隔
+    ws_send_timeout: float = 10.0
+    ws_max_subscriptions: int = 1000  # 多路复用连接可订阅的任务数上限
+    
+    # 与 agent-worker 共享的结果存储卷
+    result_store_path: str = "/app/data/results"
+    result_stream_chunk_size: int = 64 * 1024
+    
+    list_count_cache_ttl: int = 30  # 秒，列表 total 的缓存时间
+    task_batch_max_size: int = 1000  # POST /tasks/batch 单次提交的任务数上限
+    
+    # 重复提交：Idempotency-Key 映射到已创建的任务；结果备忘需与 agent-worker 配置保持一致
+    idempotency_key_prefix: str = "mandas:idempotency"
+    idempotency_key_ttl: int = 86400
+    idempotency_pending_ttl: int = 60  # 秒，任务提交完成前的占位时间
+    task_memo_key_prefix: str = "mandas:task-memo"
+    
+    # 任务出队 outbox 中继
+    outbox_batch_size: int = 500
+    outbox_poll_interval: float = 1.0
+    outbox_retention: int = 86400  # 秒，已发送的 outbox 行保留时间
+    outbox_purge_interval: int = 300
+    
+    admin_usernames: str = "admin"
+    
     max_file_size: int = 100 * 1024 * 1024  # 100MB
     allowed_file_types: str = ".pdf,.txt,.md,.doc,.docx"
     
@@ -28,6 +69,13 @@ class Settings(BaseSettings):
             return [ext.strip() for ext in v.split(',')]
         return v
     
+    @field_validator('admin_usernames')
+    @classmethod
+    def parse_admin_usernames(cls, v):
+        if isinstance(v, str):
+            return [name.strip() for name in v.split(',') if name.strip()]
+        return v
+    
     class Config:
         env_file = ".env"
 
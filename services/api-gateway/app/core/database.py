@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, String, DateTime, Text, Integer, Boolean, ARRAY
+from sqlalchemy.orm import DeclarativeBase, deferred
+from sqlalchemy import text, Column, String, DateTime, Text, Integer, BigInteger, Boolean, ARRAY, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 import uuid
@@ -31,14 +31,38 @@ class Task(Base):
     user_id = Column(UUID(as_uuid=True), nullable=False)
     status = Column(String(50), nullable=False, default="QUEUED")
     prompt = Column(Text, nullable=False)
-    plan = Column(JSONB)
-    result = Column(JSONB)
-    logs = Column(ARRAY(Text))
+    # 大字段延迟加载且访问未加载的列会报错：需要时用 undefer/undefer_group 或直接选择列
+    plan = deferred(Column(JSONB), group="plan", raiseload=True)
+    result = deferred(Column(JSONB), group="output", raiseload=True)
+    logs = deferred(Column(ARRAY(Text)), group="output", raiseload=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     retry_count = Column(Integer, default=0)
     priority = Column(Integer, default=5)
-    config = Column(JSONB, default={})
+    config = deferred(Column(JSONB, default={}), group="config", raiseload=True)
+    batch_id = Column(UUID(as_uuid=True), index=True)  # POST /tasks/batch 提交的任务所属批次
+    
+    # 列表分页按 (created_at, id) 键集倒序扫描
+    __table_args__ = (
+        Index("idx_tasks_user_created", "user_id", "created_at", "id"),
+        Index("idx_tasks_user_status_created", "user_id", "status", "created_at", "id"),
+    )
+
+
+class TaskOutbox(Base):
+    """Enqueue requests written in the same transaction as their task rows."""
+    __tablename__ = "task_outbox"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    task_id = Column(UUID(as_uuid=True), nullable=False)
+    priority = Column(Integer, default=5)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+    
+    # 中继只扫描未发送的行
+    __table_args__ = (
+        Index("idx_task_outbox_unsent", "id", postgresql_where=sent_at.is_(None)),
+    )
 
 
 class ToolsRegistry(Base):
@@ -68,6 +92,10 @@ class KnowledgeBaseDocs(Base):
     meta_data = Column(JSONB, default={})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("idx_knowledge_base_docs_user_created", "user_id", "created_at", "id"),
+    )
 
 
 class LLMModels(Base):
@@ -102,9 +130,24 @@ engine = create_async_engine(settings.database_url, echo=False)
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# init.sql 只在空数据卷上执行，create_all 也不会修改已存在的表；
+# 旧部署升级所需的列与索引在启动时补齐（语句均可重复执行）
+SCHEMA_UPGRADES = [
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS batch_id UUID",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_batch_id ON tasks(batch_id)",
+    # 键集分页索引
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_status_created ON tasks(user_id, status, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_base_docs_user_created "
+    "ON knowledge_base_docs(user_id, created_at, id)",
+]
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -0,0 +1,125 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+TaskEventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# 与 agent-worker 相同：事件先写入按任务划分的有界流，再带上流 ID 实时发布
+PUBLISH_EVENT_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], '*', 'event', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', KEYS[2], id .. ' ' .. ARGV[1])
+return id
+"""
+
+_publish_script = None
+
+
+def task_event_channel(task_id: str) -> str:
+    return f"{settings.task_events_channel_prefix}:{task_id}"
+
+
+def task_event_stream(task_id: str) -> str:
+    return f"{settings.task_events_channel_prefix}:{task_id}:stream"
+
+
+def event_id_key(event_id: str) -> Tuple[int, int]:
+    """Sort key for Redis stream IDs ("<ms>-<seq>")."""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+async def publish_task_event(task_id: str, event: Dict[str, Any]) -> str:
+    """Publish an event to every gateway replica's subscribers of the task."""
+    global _publish_script
+    redis_client = await get_redis()
+    if _publish_script is None:
+        _publish_script = redis_client.register_script(PUBLISH_EVENT_SCRIPT)
+    
+    return await _publish_script(
+        keys=[task_event_stream(task_id), task_event_channel(task_id)],
+        args=[
+            json.dumps(event, ensure_ascii=False, default=str),
+            settings.task_events_stream_maxlen,
+            settings.task_events_stream_ttl
+        ]
+    )
+
+
+async def read_task_events(task_id: str, after_event_id: str) -> List[Dict[str, Any]]:
+    """Events of a task recorded after ``after_event_id`` ("0" for all), oldest first."""
+    redis_client = await get_redis()
+    entries = await redis_client.xrange(task_event_stream(task_id), min=f"({after_event_id}", max="+")
+    
+    events = []
+    for event_id, fields in entries:
+        try:
+            event = json.loads(fields["event"])
+        except (KeyError, json.JSONDecodeError):
+            continue
+        event["event_id"] = event_id
+        events.append(event)
+    return events
+
+
+class TaskEventListener:
+    """Forwards task events from Redis pub/sub to the local WebSocket connections.
+
+    One pattern subscription per gateway process covers all tasks, so every
+    replica receives every event and delivers it to the sockets it holds.
+    """
+
+    def __init__(self, handler: TaskEventHandler):
+        self.handler = handler
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        prefix = f"{settings.task_events_channel_prefix}:"
+        while True:
+            try:
+                redis_client = await get_redis()
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{prefix}*")
+                    logger.info(f"Subscribed to task events on {prefix}*")
+                    
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        await self._dispatch(message["channel"][len(prefix):], message["data"])
+                        
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task event subscription failed: {e}, reconnecting")
+                await asyncio.sleep(1)
+
+    async def _dispatch(self, task_id: str, data: str):
+        event_id = None
+        if not data.startswith("{"):
+            event_id, _, data = data.partition(" ")
+        
+        try:
+            event = json.loads(data)
+            if event_id:
+                event["event_id"] = event_id
+        except json.JSONDecodeError:
+            logger.warning(f"Dropping malformed event for task {task_id}")
+            return
+        
+        try:
+            await self.handler(task_id, event)
+        except Exception as e:
+            logger.error(f"Failed to deliver event for task {task_id}: {e}")
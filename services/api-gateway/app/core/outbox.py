@@ -0,0 +1,100 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import select, update, delete
+from sqlalchemy.sql import func
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, TaskOutbox
+from app.core.redis_client import publish_tasks_to_queue
+
+
+class OutboxRelay:
+    """Publishes task_outbox rows to the task streams in batches.
+
+    Request handlers only insert outbox rows in the task's transaction and
+    call ``notify``. Every gateway replica runs a relay; ``FOR UPDATE SKIP
+    LOCKED`` hands each row to one of them. A crash between XADD and the
+    commit re-sends the batch, which the worker's claim makes harmless.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._last_purge = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def notify(self):
+        """Relay new rows now instead of at the next poll."""
+        self._wakeup.set()
+
+    async def relay_batch(self) -> int:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(TaskOutbox.id, TaskOutbox.task_id, TaskOutbox.priority)
+                .where(TaskOutbox.sent_at.is_(None))
+                .order_by(TaskOutbox.id)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if not rows:
+                return 0
+
+            published = await publish_tasks_to_queue(
+                [(str(row.task_id), row.priority if row.priority is not None else 5) for row in rows]
+            )
+            if not published:
+                await db.rollback()
+                return 0
+
+            await db.execute(
+                update(TaskOutbox)
+                .where(TaskOutbox.id.in_([row.id for row in rows]))
+                .values(sent_at=func.now())
+            )
+            await db.commit()
+            return len(rows)
+
+    async def _purge_sent(self):
+        if time.monotonic() - self._last_purge < settings.outbox_purge_interval:
+            return
+        self._last_purge = time.monotonic()
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(TaskOutbox).where(
+                    TaskOutbox.sent_at < func.now() - timedelta(seconds=settings.outbox_retention)
+                )
+            )
+            await db.commit()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                relayed = await self.relay_batch()
+                if relayed >= settings.outbox_batch_size:
+                    continue
+                await self._purge_sent()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_relay = OutboxRelay()
@@ -0,0 +1,50 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import Select, func, select, tuple_
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, row_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_page(query: Select, created_col, id_col, cursor: Optional[str], limit: int) -> Select:
+    """Newest-first page after ``cursor``; fetches one extra row to detect the next page.
+
+    Served by the (user_id, [status,] created_at, id) indexes without OFFSET.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+    return query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+async def cached_count(db, redis_client: redis.Redis, cache_key: str, filtered: Select) -> int:
+    """COUNT(*) of a filtered query, cached briefly in Redis; may lag by ``list_count_cache_ttl``."""
+    cached = await redis_client.get(cache_key)
+    if cached is not None:
+        return int(cached)
+
+    total = (await db.execute(
+        select(func.count()).select_from(filtered.order_by(None).subquery())
+    )).scalar_one()
+    await redis_client.set(cache_key, total, ex=settings.list_count_cache_ttl)
+    return total
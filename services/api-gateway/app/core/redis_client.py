@@ -1,4 +1,5 @@
 import redis.asyncio as redis
+from typing import List, Tuple
 from loguru import logger
 from app.core.config import settings
 
@@ -21,6 +22,15 @@ async def get_redis() -> redis.Redis:
     return redis_client
 
 
+def stream_for_priority(priority: int) -> str:
+    """按优先级选择任务流；normal 通道沿用原有的任务流"""
+    if priority <= settings.priority_high_max:
+        return f"{settings.redis_task_stream}:high"
+    if priority >= settings.priority_low_min:
+        return f"{settings.redis_task_stream}:low"
+    return settings.redis_task_stream
+
+
 async def publish_task_to_queue(task_id: str, priority: int = 5):
     try:
         message = {
@@ -29,17 +39,38 @@ async def publish_task_to_queue(task_id: str, priority: int = 5):
             "timestamp": str(int(time.time()))
         }
         
+        stream = stream_for_priority(priority)
         await redis_client.xadd(
-            settings.redis_task_stream,
+            stream,
             message,
             maxlen=10000
         )
         
-        logger.info(f"Task {task_id} published to Redis Stream")
+        logger.info(f"Task {task_id} published to Redis Stream {stream}")
         return True
     except Exception as e:
         logger.error(f"Failed to publish task {task_id} to queue: {e}")
         return False
 
 
+async def publish_tasks_to_queue(tasks: List[Tuple[str, int]]):
+    """Publish many ``(task_id, priority)`` pairs in one pipeline round trip."""
+    try:
+        timestamp = str(int(time.time()))
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for task_id, priority in tasks:
+                pipe.xadd(
+                    stream_for_priority(priority),
+                    {"task_id": task_id, "priority": priority, "timestamp": timestamp},
+                    maxlen=10000
+                )
+            await pipe.execute()
+        
+        logger.info(f"{len(tasks)} tasks published to Redis Streams")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to publish {len(tasks)} tasks to queue: {e}")
+        return False
+
+
 import time
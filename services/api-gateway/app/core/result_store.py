@@ -0,0 +1,62 @@
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, Any
+import aiofiles
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from app.core.config import settings
+
+
+# 结果存储编码 -> HTTP Content-Encoding；zlib 格式即 HTTP 的 deflate
+CONTENT_ENCODINGS = {"zstd": "zstd", "zlib": "deflate"}
+
+
+class ResultBlobMissing(Exception):
+    pass
+
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd task results")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == "zlib":
+        return zlib.decompressobj()
+    raise ValueError(f"Unknown result codec: {codec}")
+
+
+def blob_path(manifest: Dict[str, Any]) -> Path:
+    root = Path(settings.result_store_path).resolve()
+    path = (root / manifest["key"]).resolve()
+    if root not in path.parents:
+        raise ValueError("Result key escapes the result store")
+    if not path.is_file():
+        raise ResultBlobMissing(manifest["key"])
+    return path
+
+
+async def stream_result(manifest: Dict[str, Any], decompress: bool = True) -> AsyncIterator[bytes]:
+    """Yield a stored result in chunks, decompressed unless the client takes the codec as is."""
+    path = blob_path(manifest)
+    decompressor = _decompressor(manifest["codec"]) if decompress else None
+
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(settings.result_stream_chunk_size)
+            if not chunk:
+                break
+            if decompressor is None:
+                yield chunk
+                continue
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+
+    if decompressor is not None and hasattr(decompressor, "flush"):
+        tail = decompressor.flush()
+        if tail:
+            yield tail
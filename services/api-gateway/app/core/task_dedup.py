@@ -0,0 +1,89 @@
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import Task
+
+
+# 任务提交前先写入短期的 pending 标记，提交成功后才绑定到任务 ID；
+# 请求被取消或网关崩溃时标记自行过期，不会把键长期指向一个不存在的任务
+PENDING_PREFIX = "pending:"
+
+RELEASE_IF_PENDING_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def idempotency_key(user_id: str, key: str) -> str:
+    return f"{settings.idempotency_key_prefix}:{user_id}:{key}"
+
+
+def parse_idempotency_value(value: str) -> Tuple[str, bool]:
+    """Split a stored value into ``(task_id, pending)``."""
+    if value.startswith(PENDING_PREFIX):
+        return value[len(PENDING_PREFIX):], True
+    return value, False
+
+
+async def claim_idempotency_key(
+    redis_client: redis.Redis, user_id: str, key: str, task_id: str, replace: bool = False
+) -> Optional[str]:
+    """Reserve ``key`` for ``task_id`` until its insert commits.
+
+    Returns the value already bound to the key, if any. ``replace`` takes
+    the key over unconditionally, for a binding whose task no longer exists.
+    """
+    redis_key = idempotency_key(user_id, key)
+    if await redis_client.set(
+        redis_key, PENDING_PREFIX + task_id, nx=not replace, ex=settings.idempotency_pending_ttl
+    ):
+        return None
+    return await redis_client.get(redis_key)
+
+
+async def confirm_idempotency_key(redis_client: redis.Redis, user_id: str, key: str, task_id: str):
+    """Bind ``key`` to the committed task for the full ``idempotency_key_ttl``."""
+    await redis_client.set(idempotency_key(user_id, key), task_id, ex=settings.idempotency_key_ttl)
+
+
+async def release_idempotency_key(redis_client: redis.Redis, user_id: str, key: str, task_id: str):
+    """Drop this request's pending reservation, leaving any other binding alone."""
+    await redis_client.eval(
+        RELEASE_IF_PENDING_SCRIPT, 1, idempotency_key(user_id, key), PENDING_PREFIX + task_id
+    )
+
+
+def memo_key(user_id: str, prompt: str, config: Optional[Dict[str, Any]]) -> str:
+    """需与 agent-worker 的 result_memo.memo_key 保持一致"""
+    canonical = json.dumps(
+        {"prompt": prompt, "config": config or {}},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{settings.task_memo_key_prefix}:{user_id}:{digest}"
+
+
+async def find_memoized_task(
+    db: AsyncSession, redis_client: redis.Redis, user_id: str, prompt: str, config: Optional[Dict[str, Any]]
+):
+    """A completed task of the user with the same prompt and config within the memo window."""
+    task_id = await redis_client.get(memo_key(user_id, prompt, config))
+    if not task_id:
+        return None
+
+    result = await db.execute(
+        select(Task.id, Task.status, Task.result, Task.created_at, Task.updated_at).where(
+            Task.id == uuid.UUID(task_id),
+            Task.user_id == uuid.UUID(user_id),
+            Task.status == "COMPLETED"
+        )
+    )
+    return result.one_or_none()
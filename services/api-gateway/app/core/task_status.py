@@ -0,0 +1,178 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+# 与 agent-worker 相同：写入字段、递增版本号并发布变更信号
+WRITE_STATUS_SCRIPT = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[2], version)
+return version
+"""
+
+# 只补齐缺失的字段：不会用数据库中的旧值覆盖 worker 刚写入的新状态
+FILL_STATUS_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+"""
+
+_write_script = None
+_fill_script = None
+
+
+def task_status_key(task_id: str) -> str:
+    return f"{settings.task_status_key_prefix}:{task_id}"
+
+
+def task_status_channel(task_id: str) -> str:
+    return f"{settings.task_status_key_prefix}:changed:{task_id}"
+
+
+async def get_status_doc(task_id: str) -> Optional[Dict[str, Any]]:
+    """The cached status document, or None when it is missing or incomplete."""
+    try:
+        redis_client = await get_redis()
+        raw = await redis_client.hgetall(task_status_key(task_id))
+    except Exception as e:
+        logger.warning(f"Status cache read failed for task {task_id}: {e}")
+        return None
+
+    if not raw or "status" not in raw or "user_id" not in raw:
+        return None
+
+    doc: Dict[str, Any] = {"id": task_id, "step_status": {}}
+    for field, value in raw.items():
+        if field.startswith("step:"):
+            doc["step_status"][field[len("step:"):]] = value
+        elif field in ("retry_count", "version"):
+            doc[field] = int(value)
+        else:
+            doc[field] = value
+    return doc
+
+
+async def fill_status_doc(task_id: str, doc: Dict[str, Any]):
+    """Populate the cache from a database read without clobbering newer worker writes."""
+    global _fill_script
+    args = [settings.task_status_ttl]
+    for field, value in doc.items():
+        if field == "step_status":
+            for step_id, step_status in (value or {}).items():
+                args.extend((f"step:{step_id}", step_status))
+        elif field != "id" and value is not None:
+            args.extend((field, str(value)))
+
+    try:
+        redis_client = await get_redis()
+        if _fill_script is None:
+            _fill_script = redis_client.register_script(FILL_STATUS_SCRIPT)
+        await _fill_script(keys=[task_status_key(task_id)], args=args)
+    except Exception as e:
+        logger.warning(f"Status cache fill failed for task {task_id}: {e}")
+
+
+async def set_task_status(task_id: str, status: str, **fields: Any):
+    mapping = {
+        "status": status,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **{name: str(value) for name, value in fields.items() if value is not None}
+    }
+    await _write(task_id, mapping)
+
+
+async def set_step_status(task_id: str, step_id: Any, step_status: str):
+    await _write(task_id, {
+        f"step:{step_id}": step_status,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    })
+
+
+async def _write(task_id: str, mapping: Dict[str, str]):
+    global _write_script
+    args = [settings.task_status_ttl]
+    for field, value in mapping.items():
+        args.extend((field, value))
+    try:
+        redis_client = await get_redis()
+        if _write_script is None:
+            _write_script = redis_client.register_script(WRITE_STATUS_SCRIPT)
+        await _write_script(keys=[task_status_key(task_id), task_status_channel(task_id)], args=args)
+    except Exception as e:
+        logger.warning(f"Status cache write failed for task {task_id}: {e}")
+        # 丢弃可能已过时的文档，读取时回退到数据库
+        try:
+            redis_client = await get_redis()
+            await redis_client.delete(task_status_key(task_id))
+        except Exception:
+            pass
+
+
+class TaskStatusWatcher:
+    """Wakes long-polling requests when a task's status document changes.
+
+    One pattern subscription per gateway process; requests register an
+    ``asyncio.Event`` per task via ``watch`` and are woken on every version
+    bump the worker or the gateway publishes.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @asynccontextmanager
+    async def watch(self, task_id: str) -> AsyncIterator[asyncio.Event]:
+        event = asyncio.Event()
+        self._waiters.setdefault(task_id, set()).add(event)
+        try:
+            yield event
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[task_id]
+
+    async def _run(self):
+        prefix = f"{settings.task_status_key_prefix}:changed:"
+        while True:
+            try:
+                redis_client = await get_redis()
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{prefix}*")
+                    logger.info(f"Subscribed to task status changes on {prefix}*")
+                    
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        for event in self._waiters.get(message["channel"][len(prefix):], ()):
+                            event.set()
+                        
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task status subscription failed: {e}, reconnecting")
+                # 订阅中断期间可能错过变更，唤醒所有等待者重新读取
+                for waiters in self._waiters.values():
+                    for event in waiters:
+                        event.set()
+                await asyncio.sleep(1)
+
+
+status_watcher = TaskStatusWatcher()
@@ -0,0 +1,288 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fastapi import WebSocket
+from sqlalchemy import select
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, Task
+from app.core.event_bus import read_task_events, event_id_key
+
+
+class ClientConnection:
+    """One WebSocket with its own bounded outbound queue and sender task.
+
+    Producers never await the socket: ``offer`` only enqueues. When the
+    queue is full the event type decides what happens:
+
+    - ``step_status_update``: never queued directly; the latest update per
+      step is kept and flushed every ``ws_coalesce_interval_ms``
+    - ``log``: dropped
+    - anything else: the client is too slow and is disconnected
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.closed = False
+        self.dropped_logs = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+        self._pending_steps: Dict[Tuple[str, Any], dict] = {}
+        # 重放历史事件期间的实时事件缓存，None 表示未在重放
+        self._replay_buffer: Optional[List[Tuple[str, dict]]] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, replaying: bool = False):
+        if replaying:
+            self._replay_buffer = []
+        self._tasks = [
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._flush_loop())
+        ]
+
+    def encode(self, task_id: str, event: dict) -> dict:
+        """Frame sent for an event; subclasses may wrap it. Called once per accepted event."""
+        return event
+
+    def offer(self, task_id: str, event: dict) -> bool:
+        """Queue an event without waiting; returns False once the connection is closed."""
+        if self.closed:
+            return False
+
+        if self._replay_buffer is not None:
+            self._replay_buffer.append((task_id, event))
+            return True
+
+        event_type = event.get("type")
+        frame = self.encode(task_id, event)
+        if event_type == "step_status_update":
+            step_id = (event.get("payload") or {}).get("step_id")
+            self._pending_steps[(task_id, step_id)] = frame
+            return True
+
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if event_type == "log":
+                self.dropped_logs += 1
+                return True
+            logger.warning(f"WebSocket send queue full, disconnecting slow client ({event_type})")
+            self.close(code=1013)
+            return False
+        return True
+
+    async def send_replay(self, task_id: str, events: List[dict], last_event_id: str):
+        """Queue replayed events in order, then the live events buffered meanwhile."""
+        last_sent = last_event_id
+        for event in events:
+            await self._queue.put(self.encode(task_id, event))
+            last_sent = event["event_id"]
+
+        buffered, self._replay_buffer = self._replay_buffer or [], None
+        for buffered_task_id, event in buffered:
+            event_id = event.get("event_id")
+            if event_id and event_id_key(event_id) <= event_id_key(last_sent):
+                continue
+            self.offer(buffered_task_id, event)
+
+    async def send_now(self, message: dict):
+        await self._queue.put(message)
+
+    async def _send_loop(self):
+        try:
+            while True:
+                frame = await self._queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_json(frame), timeout=settings.ws_send_timeout
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket send failed, closing connection: {e}")
+            self.close()
+
+    async def _flush_loop(self):
+        interval = settings.ws_coalesce_interval_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            self._flush_steps()
+
+    def _flush_steps(self):
+        if not self._pending_steps:
+            return
+
+        pending, self._pending_steps = self._pending_steps, {}
+        for key, frame in pending.items():
+            try:
+                self._queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # 队列已满：保留已编码的帧（不重新分配序号），下个周期再发送；期间若有更新的状态则以新的为准
+                self._pending_steps.setdefault(key, frame)
+
+    def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class MultiplexConnection(ClientConnection):
+    """One authenticated socket carrying the events of many tasks.
+
+    Every frame names its task and carries a per-task sequence number,
+    assigned once when the event is accepted. A missing number means that
+    event was not delivered: a log dropped by backpressure, or a step
+    update superseded by a newer one for the same step. Step updates are
+    flushed periodically, so they can arrive after frames with higher
+    numbers.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        super().__init__(websocket)
+        self.user_id = user_id
+        self.task_ids: Set[str] = set()
+        self.user_scope = False
+        self._sequences: Dict[str, int] = {}
+
+    def encode(self, task_id: str, event: dict) -> dict:
+        seq = self._sequences.get(task_id, 0) + 1
+        self._sequences[task_id] = seq
+        return {"type": "task_event", "task_id": task_id, "seq": seq, "event": event}
+
+
+class TaskOwnerCache:
+    """task_id -> user_id lookups; a task's owner never changes, so entries never go stale."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._owners: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    async def get(self, task_id: str) -> Optional[str]:
+        if task_id in self._owners:
+            self._owners.move_to_end(task_id)
+            return self._owners[task_id]
+
+        try:
+            task_uuid = uuid.UUID(task_id)
+        except ValueError:
+            return None
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Task.user_id).where(Task.id == task_uuid))
+            owner = result.scalar_one_or_none()
+        owner = str(owner) if owner else None
+
+        # 任务可能尚未提交，未找到时不缓存
+        if owner is not None:
+            self._owners[task_id] = owner
+            if len(self._owners) > self.max_size:
+                self._owners.popitem(last=False)
+        return owner
+
+
+class ConnectionManager:
+    def __init__(self):
+        self.active_connections: Dict[str, Set[ClientConnection]] = {}
+        # 订阅了“当前用户全部任务”的多路复用连接，按 user_id 索引
+        self.user_connections: Dict[str, Set[MultiplexConnection]] = {}
+        self.task_owners = TaskOwnerCache()
+
+    async def connect(self, websocket: WebSocket, task_id: str, replaying: bool = False) -> ClientConnection:
+        await websocket.accept()
+        connection = ClientConnection(websocket)
+        connection.start(replaying=replaying)
+        if task_id not in self.active_connections:
+            self.active_connections[task_id] = set()
+        self.active_connections[task_id].add(connection)
+        return connection
+
+    def disconnect(self, connection: ClientConnection, task_id: str):
+        connection.close()
+        self._remove(connection, task_id)
+
+    def _remove(self, connection: ClientConnection, task_id: str):
+        if task_id in self.active_connections:
+            self.active_connections[task_id].discard(connection)
+            if not self.active_connections[task_id]:
+                del self.active_connections[task_id]
+
+    async def connect_multiplex(self, websocket: WebSocket, user_id: str) -> MultiplexConnection:
+        await websocket.accept()
+        connection = MultiplexConnection(websocket, user_id)
+        connection.start()
+        return connection
+
+    async def subscribe(self, connection: MultiplexConnection, task_ids: List[str]) -> Tuple[List[str], List[str]]:
+        """Subscribe to tasks owned by the connection's user; returns (subscribed, rejected)."""
+        subscribed, rejected = [], []
+        for task_id in task_ids:
+            if task_id in connection.task_ids:
+                subscribed.append(task_id)
+                continue
+            if len(connection.task_ids) >= settings.ws_max_subscriptions:
+                rejected.append(task_id)
+                continue
+            if await self.task_owners.get(task_id) != connection.user_id:
+                rejected.append(task_id)
+                continue
+
+            connection.task_ids.add(task_id)
+            self.active_connections.setdefault(task_id, set()).add(connection)
+            subscribed.append(task_id)
+        return subscribed, rejected
+
+    def unsubscribe(self, connection: MultiplexConnection, task_ids: List[str]):
+        for task_id in task_ids:
+            connection.task_ids.discard(task_id)
+            self._remove(connection, task_id)
+
+    def subscribe_user(self, connection: MultiplexConnection):
+        connection.user_scope = True
+        self.user_connections.setdefault(connection.user_id, set()).add(connection)
+
+    def unsubscribe_user(self, connection: MultiplexConnection):
+        connection.user_scope = False
+        connections = self.user_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.user_connections[connection.user_id]
+
+    def disconnect_multiplex(self, connection: MultiplexConnection):
+        connection.close()
+        self.unsubscribe(connection, list(connection.task_ids))
+        self.unsubscribe_user(connection)
+
+    async def replay(self, connection: ClientConnection, task_id: str, last_event_id: str):
+        """Send the events recorded after ``last_event_id``, then switch to live delivery."""
+        events = await read_task_events(task_id, last_event_id)
+        await connection.send_replay(task_id, events, last_event_id)
+
+    async def broadcast_to_task(self, task_id: str, message: dict):
+        """Hand an event to every subscriber's queue; never waits on a socket."""
+        targets: Set[ClientConnection] = set(self.active_connections.get(task_id, ()))
+
+        # 仅在有用户级订阅时才需要查询任务归属
+        if self.user_connections:
+            owner = await self.task_owners.get(task_id)
+            if owner is not None:
+                targets.update(self.user_connections.get(owner, ()))
+
+        for connection in targets:
+            if not connection.offer(task_id, message):
+                self._remove(connection, task_id)
+
+
+manager = ConnectionManager()
@@ -15,7 +15,11 @@ from app.core.database import init_db
 from app.core.redis_client import init_redis
 from app.core.logging import setup_logging
 from app.core.tracing import setup_tracing
-from app.api.v1 import tasks, documents, auth, health, tools, memory
+from app.core.event_bus import TaskEventListener
+from app.core.websocket_manager import manager as websocket_manager
+from app.core.task_status import status_watcher
+from app.core.outbox import outbox_relay
+from app.api.v1 import tasks, documents, auth, health, tools, memory, admin
 from app.core.auth import verify_token
 
 
@@ -25,9 +29,18 @@ async def lifespan(app: FastAPI):
     setup_tracing()
     await init_db()
     await init_redis()
+    
+    event_listener = TaskEventListener(websocket_manager.broadcast_to_task)
+    event_listener.start()
+    status_watcher.start()
+    outbox_relay.start()
+    
     logger.info("Mandas API Gateway started successfully")
     yield
     logger.info("Mandas API Gateway shutting down")
+    await event_listener.stop()
+    await status_watcher.stop()
+    await outbox_relay.stop()
 
 
 app = FastAPI(
@@ -44,6 +57,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 跨域请求下浏览器默认隐藏这些响应头，分页与条件请求需要读取
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
 )
 
 security = HTTPBearer()
@@ -88,6 +103,12 @@ app.include_router(
     dependencies=[Depends(get_current_user)]
 )
 
+app.include_router(
+    admin.router,
+    prefix="/mandas/v1/admin",
+    tags=["admin"]
+)
+
 app.include_router(
     tasks.router,
     prefix="/internal",
@@ -0,0 +1,119 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Select, Update
+
+from app.core import outbox
+from app.core.config import settings
+from app.core.outbox import OutboxRelay
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.committed = False
+        self.rolled_back = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.rows if isinstance(statement, Select) else [])
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def relay_env(monkeypatch):
+    env = SimpleNamespace(rows=[], published=[], publish_ok=True, sessions=[])
+
+    def session_factory():
+        session = FakeSession(env.rows)
+        env.sessions.append(session)
+        return session
+
+    async def publish(tasks):
+        env.published.append(tasks)
+        return env.publish_ok
+
+    monkeypatch.setattr(outbox, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(outbox, "publish_tasks_to_queue", publish)
+    return env
+
+
+def outbox_row(row_id, priority=5):
+    return SimpleNamespace(id=row_id, task_id=uuid.uuid4(), priority=priority)
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_batch_and_marks_rows_sent(relay_env):
+    relay_env.rows = [outbox_row(1, 9), outbox_row(2, None)]
+
+    assert await OutboxRelay().relay_batch() == 2
+
+    session = relay_env.sessions[0]
+    assert relay_env.published == [[(str(relay_env.rows[0].task_id), 9), (str(relay_env.rows[1].task_id), 5)]]
+    select_sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in select_sql
+    assert "task_outbox.sent_at IS NULL" in select_sql
+
+    mark_sent = session.statements[1]
+    assert isinstance(mark_sent, Update)
+    assert "sent_at" in str(mark_sent.compile(dialect=postgresql.dialect()))
+    assert session.committed
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_leaves_rows_unsent(relay_env):
+    relay_env.rows = [outbox_row(1)]
+    relay_env.publish_ok = False
+
+    assert await OutboxRelay().relay_batch() == 0
+
+    session = relay_env.sessions[0]
+    assert len(session.statements) == 1
+    assert session.rolled_back
+    assert not session.committed
+
+
+@pytest.mark.asyncio
+async def test_empty_outbox_publishes_nothing(relay_env):
+    assert await OutboxRelay().relay_batch() == 0
+    assert relay_env.published == []
+
+
+@pytest.mark.asyncio
+async def test_notify_wakes_the_relay_before_the_poll_interval(relay_env, monkeypatch):
+    monkeypatch.setattr(settings, "outbox_poll_interval", 60)
+    monkeypatch.setattr(settings, "outbox_purge_interval", 3600)
+    relay = OutboxRelay()
+    relay._last_purge = float("inf")
+    relay.start()
+    try:
+        await asyncio.sleep(0.01)
+        relay_env.rows.append(outbox_row(1))
+        relay.notify()
+        await asyncio.sleep(0.01)
+    finally:
+        await relay.stop()
+
+    assert len(relay_env.published) == 1
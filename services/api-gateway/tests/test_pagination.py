@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import Task
+from app.core.pagination import decode_cursor, encode_cursor, keyset_page
+
+
+def compile_query(query):
+    return query.compile(dialect=postgresql.dialect())
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+
+    cursor = encode_cursor(created_at, row_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "!!!", encode_cursor(datetime.now(), uuid.uuid4())[:-6]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def test_keyset_page_first_page_fetches_one_extra_row():
+    query = keyset_page(select(Task.id), Task.created_at, Task.id, None, 20)
+    compiled = compile_query(query)
+    sql = str(compiled)
+
+    assert "ORDER BY tasks.created_at DESC, tasks.id DESC" in sql
+    assert "WHERE" not in sql
+    assert 21 in compiled.params.values()
+
+
+def test_keyset_page_continues_after_cursor():
+    created_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+
+    query = keyset_page(select(Task.id), Task.created_at, Task.id, encode_cursor(created_at, row_id), 10)
+    compiled = compile_query(query)
+
+    assert "(tasks.created_at, tasks.id) < (" in str(compiled)
+    assert created_at in compiled.params.values()
+    assert row_id in compiled.params.values()
+    assert 11 in compiled.params.values()
@@ -0,0 +1,46 @@
+import json
+import zlib
+import pytest
+
+from app.core.config import settings
+from app.core.result_store import ResultBlobMissing, blob_path, stream_result
+
+
+RESULT = {"status": "success", "conversation": [{"content": "结果" * 200}] * 20}
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "result_store_path", str(tmp_path))
+    monkeypatch.setattr(settings, "result_stream_chunk_size", 256)
+    blob = zlib.compress(json.dumps(RESULT, ensure_ascii=False).encode("utf-8"))
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / "abcd.json.zlib").write_bytes(blob)
+    return {"key": "ab/abcd.json.zlib", "codec": "zlib", "stored_size": len(blob)}
+
+
+async def collect(manifest, decompress=True) -> bytes:
+    return b"".join([chunk async for chunk in stream_result(manifest, decompress=decompress)])
+
+
+@pytest.mark.asyncio
+async def test_stream_result_decompresses_in_chunks(manifest):
+    assert json.loads(await collect(manifest)) == RESULT
+
+
+@pytest.mark.asyncio
+async def test_stream_result_passes_blob_through(manifest):
+    raw = await collect(manifest, decompress=False)
+
+    assert len(raw) == manifest["stored_size"]
+    assert json.loads(zlib.decompress(raw)) == RESULT
+
+
+def test_missing_blob_is_reported(manifest):
+    with pytest.raises(ResultBlobMissing):
+        blob_path({**manifest, "key": "ab/gone.json.zlib"})
+
+
+def test_key_outside_the_store_is_rejected(manifest):
+    with pytest.raises(ValueError):
+        blob_path({**manifest, "key": "../outside.json.zlib"})
@@ -0,0 +1,95 @@
+import pytest
+
+from app.core.config import settings
+from app.core.task_dedup import (
+    RELEASE_IF_PENDING_SCRIPT, claim_idempotency_key, confirm_idempotency_key,
+    idempotency_key, parse_idempotency_value, release_idempotency_key
+)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttls[key] = ex
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, key, expected):
+        assert script == RELEASE_IF_PENDING_SCRIPT
+        if self.data.get(key) == expected:
+            del self.data[key]
+            return 1
+        return 0
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
+
+
+@pytest.mark.asyncio
+async def test_claim_reserves_key_as_pending(redis_client):
+    assert await claim_idempotency_key(redis_client, "u1", "k", "task-1") is None
+
+    redis_key = idempotency_key("u1", "k")
+    assert redis_client.data[redis_key] == "pending:task-1"
+    assert redis_client.ttls[redis_key] == settings.idempotency_pending_ttl
+
+
+@pytest.mark.asyncio
+async def test_duplicate_sees_pending_then_confirmed_task(redis_client):
+    await claim_idempotency_key(redis_client, "u1", "k", "task-1")
+
+    existing = await claim_idempotency_key(redis_client, "u1", "k", "task-2")
+    assert parse_idempotency_value(existing) == ("task-1", True)
+
+    await confirm_idempotency_key(redis_client, "u1", "k", "task-1")
+    existing = await claim_idempotency_key(redis_client, "u1", "k", "task-2")
+    assert parse_idempotency_value(existing) == ("task-1", False)
+    assert redis_client.ttls[idempotency_key("u1", "k")] == settings.idempotency_key_ttl
+
+
+@pytest.mark.asyncio
+async def test_keys_are_scoped_per_user(redis_client):
+    await claim_idempotency_key(redis_client, "u1", "k", "task-1")
+
+    assert await claim_idempotency_key(redis_client, "u2", "k", "task-2") is None
+
+
+@pytest.mark.asyncio
+async def test_release_drops_only_own_pending_reservation(redis_client):
+    redis_key = idempotency_key("u1", "k")
+    await claim_idempotency_key(redis_client, "u1", "k", "task-1")
+
+    await release_idempotency_key(redis_client, "u1", "k", "task-2")
+    assert redis_client.data[redis_key] == "pending:task-1"
+
+    await release_idempotency_key(redis_client, "u1", "k", "task-1")
+    assert redis_key not in redis_client.data
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_confirmed_binding(redis_client):
+    await claim_idempotency_key(redis_client, "u1", "k", "task-1")
+    await confirm_idempotency_key(redis_client, "u1", "k", "task-1")
+
+    await release_idempotency_key(redis_client, "u1", "k", "task-1")
+
+    assert redis_client.data[idempotency_key("u1", "k")] == "task-1"
+
+
+@pytest.mark.asyncio
+async def test_replace_takes_over_stale_binding(redis_client):
+    await claim_idempotency_key(redis_client, "u1", "k", "task-1")
+    await confirm_idempotency_key(redis_client, "u1", "k", "task-1")
+
+    assert await claim_idempotency_key(redis_client, "u1", "k", "task-2", replace=True) is None
+    assert redis_client.data[idempotency_key("u1", "k")] == "pending:task-2"
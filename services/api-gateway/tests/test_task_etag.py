@@ -0,0 +1,114 @@
+import asyncio
+import time
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import tasks
+from app.core.auth import get_current_user
+from app.core.database import get_db
+from app.core.task_status import status_watcher
+
+
+TASK_ID = str(uuid.uuid4())
+
+
+class FakeSession:
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def task_state(monkeypatch):
+    state = {"body": {"id": TASK_ID, "status": "RUNNING"}, "loads": 0, "change_after_first_load": False}
+
+    async def load_task(task_uuid, names, current_user, db):
+        state["loads"] += 1
+        body = dict(state["body"])
+        if state["change_after_first_load"] and state["loads"] == 1:
+            # 模拟 worker 在请求挂起期间更新了任务
+            state["body"]["status"] = "COMPLETED"
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, lambda: [event.set() for event in status_watcher._waiters[TASK_ID]])
+        return body
+
+    monkeypatch.setattr(tasks, "_load_task", load_task)
+    return state
+
+
+@pytest.fixture
+def client(task_state):
+    async def fake_db():
+        yield FakeSession()
+
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/tasks")
+    app.dependency_overrides[get_current_user] = lambda: {"sub": str(uuid.uuid4())}
+    app.dependency_overrides[get_db] = fake_db
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("if_none_match, etag, expected", [
+    (None, 'W/"abc"', False),
+    ('W/"abc"', 'W/"abc"', True),
+    ('"abc"', 'W/"abc"', True),
+    ('W/"other", W/"abc"', 'W/"abc"', True),
+    ("*", 'W/"abc"', True),
+    ('W/"other"', 'W/"abc"', False),
+])
+def test_etag_matching_is_weak(if_none_match, etag, expected):
+    assert tasks._etag_matches(if_none_match, etag) is expected
+
+
+def test_etag_depends_only_on_content():
+    assert tasks._etag({"a": 1, "b": 2}) == tasks._etag({"b": 2, "a": 1})
+    assert tasks._etag({"a": 1}) != tasks._etag({"a": 2})
+
+
+def test_unchanged_task_gets_304(client):
+    response = client.get(f"/tasks/{TASK_ID}")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "RUNNING"
+    assert response.headers["cache-control"] == "no-cache"
+
+    revalidated = client.get(f"/tasks/{TASK_ID}", headers={"If-None-Match": etag})
+
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.content == b""
+
+
+def test_stale_etag_gets_the_current_body(client, task_state):
+    etag = client.get(f"/tasks/{TASK_ID}").headers["etag"]
+    task_state["body"]["status"] = "COMPLETED"
+
+    response = client.get(f"/tasks/{TASK_ID}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "COMPLETED"
+    assert response.headers["etag"] != etag
+
+
+def test_long_poll_returns_when_the_task_changes(client, task_state):
+    etag = client.get(f"/tasks/{TASK_ID}").headers["etag"]
+    task_state["loads"] = 0
+    task_state["change_after_first_load"] = True
+
+    started = time.monotonic()
+    response = client.get(f"/tasks/{TASK_ID}?wait=5", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "COMPLETED"
+    assert task_state["loads"] == 2
+    assert time.monotonic() - started < 2
+
+
+def test_long_poll_times_out_with_304(client):
+    etag = client.get(f"/tasks/{TASK_ID}").headers["etag"]
+
+    response = client.get(f"/tasks/{TASK_ID}?wait=0.1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
@@ -0,0 +1,80 @@
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1 import tasks
+from app.core.auth import create_access_token
+from app.core.websocket_manager import manager
+
+
+TASK_ID = str(uuid.uuid4())
+OWNER_ID = str(uuid.uuid4())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    replayed = []
+
+    async def owner_of(task_id):
+        return OWNER_ID if task_id == TASK_ID else None
+
+    async def replay(connection, task_id, last_event_id):
+        replayed.append((task_id, last_event_id))
+
+    monkeypatch.setattr(manager.task_owners, "get", owner_of)
+    monkeypatch.setattr(manager, "replay", replay)
+
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/tasks")
+    test_client = TestClient(app)
+    test_client.replayed = replayed
+    return test_client
+
+
+def test_live_stream_needs_no_token(client):
+    with client.websocket_connect(f"/tasks/{TASK_ID}/stream") as websocket:
+        assert websocket.receive_json()["type"] == "connection_established"
+    assert client.replayed == []
+
+
+@pytest.mark.parametrize("token", [None, "not-a-jwt", create_access_token({"sub": str(uuid.uuid4())})])
+def test_replay_requires_the_owners_token(client, token):
+    url = f"/tasks/{TASK_ID}/stream?last_event_id=0"
+    if token:
+        url += f"&token={token}"
+
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect(url) as websocket:
+            websocket.receive_json()
+
+    assert exc_info.value.code == 1008
+    assert client.replayed == []
+
+
+def test_owner_can_replay(client):
+    token = create_access_token({"sub": OWNER_ID})
+
+    with client.websocket_connect(f"/tasks/{TASK_ID}/stream?last_event_id=0&token={token}") as websocket:
+        assert websocket.receive_json()["type"] == "connection_established"
+
+    assert client.replayed == [(TASK_ID, "0")]
+
+
+class FakeMultiplexConnection:
+    def __init__(self):
+        self.sent = []
+
+    async def send_now(self, frame):
+        self.sent.append(frame)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("task_ids", ["abc", {"id": TASK_ID}, [TASK_ID, 42], [None]])
+async def test_subscription_rejects_malformed_task_ids(task_ids):
+    connection = FakeMultiplexConnection()
+
+    await tasks._handle_subscription_message(connection, {"action": "subscribe", "task_ids": task_ids})
+
+    assert connection.sent == [{"type": "error", "message": "\"task_ids\" must be a list of strings"}]
@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+
+from app.core.config import settings
+from app.core.websocket_manager import ClientConnection, MultiplexConnection
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def send_json(self, frame):
+        self.sent.append(frame)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+def log(message: str) -> dict:
+    return {"type": "log", "payload": {"message": message}}
+
+
+def step_update(step_id: int, status: str) -> dict:
+    return {"type": "step_status_update", "payload": {"step_id": step_id, "status": status}}
+
+
+@pytest.fixture
+def small_queue(monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 2)
+    monkeypatch.setattr(settings, "ws_coalesce_interval_ms", 1)
+
+
+@pytest.mark.asyncio
+async def test_logs_are_dropped_when_queue_is_full(small_queue):
+    connection = ClientConnection(FakeWebSocket())
+
+    for i in range(5):
+        assert connection.offer("t1", log(f"line {i}"))
+
+    assert connection.dropped_logs == 3
+    assert not connection.closed
+
+
+@pytest.mark.asyncio
+async def test_other_events_disconnect_slow_client(small_queue):
+    websocket = FakeWebSocket()
+    connection = ClientConnection(websocket)
+    connection.offer("t1", log("a"))
+    connection.offer("t1", log("b"))
+
+    assert connection.offer("t1", {"type": "task_update", "payload": {}}) is False
+    await asyncio.sleep(0)
+
+    assert connection.closed
+    assert websocket.close_code == 1013
+    assert connection.offer("t1", log("after close")) is False
+
+
+@pytest.mark.asyncio
+async def test_step_updates_are_coalesced_per_step(small_queue):
+    websocket = FakeWebSocket()
+    connection = ClientConnection(websocket)
+    connection.start()
+    try:
+        connection.offer("t1", step_update(1, "RUNNING"))
+        connection.offer("t1", step_update(1, "COMPLETED"))
+        connection.offer("t1", step_update(2, "RUNNING"))
+        await asyncio.sleep(0.05)
+    finally:
+        connection.close()
+
+    statuses = {frame["payload"]["step_id"]: frame["payload"]["status"] for frame in websocket.sent}
+    assert len(websocket.sent) == 2
+    assert statuses == {1: "COMPLETED", 2: "RUNNING"}
+
+
+@pytest.mark.asyncio
+async def test_replay_buffers_live_events_until_replay_is_sent(small_queue, monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 10)
+    connection = ClientConnection(FakeWebSocket())
+    connection._replay_buffer = []
+
+    connection.offer("t1", {"type": "log", "event_id": "1-0"})
+    connection.offer("t1", {"type": "log", "event_id": "3-0"})
+    await connection.send_replay("t1", [{"type": "log", "event_id": "2-0"}, {"type": "log", "event_id": "1-0"}], "0-0")
+
+    queued = [connection._queue.get_nowait()["event_id"] for _ in range(connection._queue.qsize())]
+    assert queued == ["2-0", "1-0", "3-0"]
+
+
+@pytest.mark.asyncio
+async def test_multiplex_seq_is_assigned_once_per_accepted_event(monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 1)
+    connection = MultiplexConnection(FakeWebSocket(), user_id="u1")
+
+    connection.offer("t1", log("fills the queue"))
+    connection.offer("t1", step_update(1, "RUNNING"))
+
+    # 队列已满：帧保留在待发送集合中，序号不变
+    connection._flush_steps()
+    assert [frame["seq"] for frame in connection._pending_steps.values()] == [2]
+
+    assert connection._queue.get_nowait()["seq"] == 1
+    connection._flush_steps()
+    assert connection._queue.get_nowait()["seq"] == 2
+
+    connection.offer("t1", log("next"))
+    assert connection._queue.get_nowait()["seq"] == 3
+    connection.offer("t2", log("other task"))
+    assert connection._queue.get_nowait()["seq"] == 1
+
+
+@pytest.mark.asyncio
+async def test_multiplex_dropped_log_leaves_a_gap(monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 1)
+    connection = MultiplexConnection(FakeWebSocket(), user_id="u1")
+
+    connection.offer("t1", log("kept"))
+    connection.offer("t1", log("dropped"))
+    assert connection._queue.get_nowait()["seq"] == 1
+
+    connection.offer("t1", log("kept too"))
+    assert connection._queue.get_nowait()["seq"] == 3